@@ -0,0 +1 @@
+'''Benchmarks for glossarpy on synthetic glossaries. See the Benchmarks section of the readme.'''
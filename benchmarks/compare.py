@@ -0,0 +1,54 @@
+import argparse
+import json
+import sys
+
+
+def compare(baseline:dict, current:dict, threshold:float = 0.1, memory_threshold:float = None):
+    '''Return (rows, regressions) comparing two results files. A stage regresses if it takes more
+    than threshold (0.1 = 10%) longer than in baseline, or, if memory_threshold is set, uses
+    that much more peak memory. Stages missing from either file are skipped.'''
+    before = {(result["stage"], result["entries"]): result for result in baseline["results"]}
+    rows = []
+    regressions = []
+    for result in current["results"]:
+        old = before.get((result["stage"], result["entries"]))
+        if old is None:
+            continue
+        time_change = result["seconds"] / old["seconds"] - 1 if old["seconds"] else 0.0
+        memory_change = None
+        if old.get("peak_bytes") and result.get("peak_bytes") is not None:
+            memory_change = result["peak_bytes"] / old["peak_bytes"] - 1
+        regressed = time_change > threshold or (
+            memory_threshold is not None and memory_change is not None and memory_change > memory_threshold)
+        row = (result["stage"], result["entries"], old["seconds"], result["seconds"], time_change, memory_change, regressed)
+        rows.append(row)
+        if regressed:
+            regressions.append(row)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare",
+        description="Compare two benchmark results files, failing if any stage got slower")
+    parser.add_argument("baseline", help="results file to compare against")
+    parser.add_argument("current", help="results file to check")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown, 0.1 = 10%% (default)")
+    parser.add_argument("--memory-threshold", type=float, default=None, help="allowed growth in peak memory, off by default")
+    args = parser.parse_args(argv)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows, regressions = compare(baseline, current, args.threshold, args.memory_threshold)
+    for stage, entries, old, new, time_change, memory_change, regressed in rows:
+        memory = f" {memory_change:+8.1%} memory" if memory_change is not None else ""
+        print(f"{stage:>16} {entries:>9} entries {old:10.4f} s -> {new:10.4f} s {time_change:+8.1%}{memory}"
+            + ("  REGRESSION" if regressed else ""))
+    if regressions:
+        print(f"{len(regressions)} stage(s) regressed beyond the threshold", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
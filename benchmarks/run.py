@@ -0,0 +1,126 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from . import synthetic
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+
+
+def stage_generate_rst(glossary, workdir):
+    for entry in glossary.glosslist:
+        entry.generate_RST()
+
+
+def stage_links(glossary, workdir):
+    for entry in glossary.glosslist:
+        entry.rst_process_links(entry.definition)
+
+
+def stage_make_toc(glossary, workdir):
+    glossary.make_toc(format="rst")
+
+
+def stage_sort_entries(glossary, workdir):
+    glossary.sort_entries()
+
+
+def stage_write_glossary(glossary, workdir):
+    glossary.write_glossary(os.path.join(workdir, "glossary.rst"), append=False)
+
+
+STAGES = {
+    "generate_RST": stage_generate_rst,
+    "links": stage_links,
+    "make_toc": stage_make_toc,
+    "sort_entries": stage_sort_entries,
+    "write_glossary": stage_write_glossary,
+}
+UNSORTS = ("sort_entries",)  # stages that need a freshly shuffled glossary every repeat
+
+
+def measure(stage:str, glossary, workdir:str, repeat:int, memory:bool):
+    '''Return the best wall time of repeat runs, and the peak memory allocated by one more run'''
+    function = STAGES[stage]
+    original = list(glossary.glosslist)
+    best = float("inf")
+    for _ in range(repeat):
+        if stage in UNSORTS:
+            glossary.glosslist[:] = original
+        gc.collect()
+        start = time.perf_counter()
+        function(glossary, workdir)
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if memory:
+        if stage in UNSORTS:
+            glossary.glosslist[:] = original
+        gc.collect()
+        tracemalloc.start()
+        function(glossary, workdir)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(sizes, stages, repeat:int = 3, memory:bool = True, log=sys.stderr, **synthetic_options):
+    '''Run every stage at every size and return the results as a list of dicts'''
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            glossary = synthetic.make_glossary(size, **synthetic_options)
+            for stage in stages:
+                seconds, peak = measure(stage, glossary, workdir, repeat, memory)
+                results.append({
+                    "stage": stage,
+                    "entries": size,
+                    "seconds": seconds,
+                    "entries_per_second": size / seconds if seconds else None,
+                    "peak_bytes": peak,
+                })
+                print(f"{stage:>16} {size:>9} entries {seconds:10.4f} s {size / seconds if seconds else 0:14.0f} entries/s"
+                    + (f" {peak / 1e6:10.1f} MB peak" if peak is not None else ""), file=log)
+            del glossary
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Time glossarpy on synthetic glossaries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="glossary sizes to test")
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), default=list(STAGES), help="stages to time")
+    parser.add_argument("--repeat", type=int, default=3, help="keep the best of this many runs")
+    parser.add_argument("--no-memory", action="store_true", help="skip the extra run that measures peak memory")
+    parser.add_argument("--definition-words", type=int, default=30)
+    parser.add_argument("--link-density", type=float, default=0.1)
+    parser.add_argument("--seealso", type=float, default=0.3)
+    parser.add_argument("--institute", type=float, default=0.2)
+    parser.add_argument("--pronunciation", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="where to write the results")
+    args = parser.parse_args(argv)
+    options = {
+        "definition_words": args.definition_words,
+        "link_density": args.link_density,
+        "seealso": args.seealso,
+        "institute": args.institute,
+        "pronunciation": args.pronunciation,
+        "seed": args.seed,
+    }
+    results = run(args.sizes, args.stages, repeat=args.repeat, memory=not args.no_memory, **options)
+    with open(args.output, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "options": options,
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
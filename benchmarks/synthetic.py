@@ -0,0 +1,49 @@
+import datetime
+import random
+from glossarpy.GlossEntry import GlossEntry
+from glossarpy.GreatGloss import GreatGloss
+
+WORDS = ("workflow", "container", "pipeline", "genome", "reference", "alignment", "variant", "cohort",
+    "sample", "index", "registry", "launcher", "platform", "descriptor", "checker", "parameter",
+    "input", "output", "file", "task", "tool", "service", "cloud", "cluster", "runtime", "engine")
+PUNCTUATION = ("", "", "", "", ",", ".", ";", ")")
+INSTITUTES = ("UCSC", "the Broad Institute", "OICR", "Terra", "AnVIL", "BioData Catalyst")
+PRONUNCIATIONS = ("widdle", "cwil", "nextflow", "snake-make", "ga-four-gh")
+
+
+def make_entries(count:int, definition_words:int = 30, link_density:float = 0.1, seealso:float = 0.3,
+        institute:float = 0.2, pronunciation:float = 0.1, acronym:float = 0.2, seed:int = 0):
+    '''Return count GlossEntry objects with made-up but realistic-looking fields.
+    The same arguments always give the same entries, in the same (unsorted) order.
+    definition_words - how many words each definition has
+    link_density - fraction of definition words that are [links] to other entries
+    seealso, institute, pronunciation, acronym - fraction of entries with that field filled in'''
+    rng = random.Random(seed)
+    names = [f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}" for i in range(count)]
+    order = list(range(count))
+    rng.shuffle(order)
+    updated = datetime.date(2022, 6, 1)
+    entries = []
+    for i in order:
+        words = []
+        for _ in range(definition_words):
+            if rng.random() < link_density:
+                words.append(f"[{names[rng.randrange(count)]}]{rng.choice(PUNCTUATION)}")
+            else:
+                words.append(rng.choice(WORDS) + rng.choice(PUNCTUATION))
+        entries.append(GlossEntry(names[i],
+            acronym_full=f"[{names[rng.randrange(count)]}]" if rng.random() < acronym else "",
+            definition=" ".join(words),
+            furtherreading=f"https://example.org/{i}" if rng.random() < 0.5 else "",
+            institute=rng.choice(INSTITUTES) if rng.random() < institute else "",
+            pronunciation=rng.choice(PRONUNCIATIONS) if rng.random() < pronunciation else "",
+            seealso=f"[{names[rng.randrange(count)]}], [{names[rng.randrange(count)]}]" if rng.random() < seealso else "",
+            updated=updated))
+    return entries
+
+
+def make_glossary(count:int, **kwargs):
+    '''Return an unsorted GreatGloss of make_entries(count, **kwargs)'''
+    glossary = GreatGloss(f"Synthetic Glossary ({count} entries)", updated=datetime.date(2022, 6, 1))
+    glossary.add_entries(make_entries(count, **kwargs))
+    return glossary
@@ -8,7 +8,9 @@ Imports the entries from example_standalone_entries.py by simply
 importing all of example_standalone_entries.py, then gathering
 all GlossEntry objects into a GreatGloss object. This isn't
 recommended, but if you want to keep your entries separate from
-the actual code that builds them, it is an option.
+the actual code that builds them, it is an option. If your entries
+can live in a CSV, JSON Lines, or TOML file instead, see
+example_load_entries.py, which is faster and keeps entries in order.
 
 See readme for info on sourcefile.
 """
@@ -0,0 +1,22 @@
+from glossarpy.GreatGloss import GreatGloss
+
+"""
+Builds a glossary straight from a JSON Lines file, with one entry per line.
+GreatGloss.from_csv() and GreatGloss.from_toml() work the same way for CSV
+and TOML files, and GreatGloss.from_files() picks based on file extension.
+
+Unlike example_import_entries.py, the entries don't need to be Python at all,
+and they are added in the order they appear in the file. If a line can't be
+turned into an entry, a GlossLoadError says which file and line it's on; pass
+errors="collect" to skip bad lines and list them in load_errors instead.
+
+See readme for info on sourcefile.
+"""
+
+
+source = "examples/example_entries.jsonl"
+outfile = "examples/loaded_entries_output.rst"
+
+LoadedGlossary = GreatGloss.from_jsonl(source, "Loaded From JSON Lines")
+LoadedGlossary.sort_entries()
+LoadedGlossary.write_glossary(outfile, sourcefile=source, append=False)
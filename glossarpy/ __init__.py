@@ -1 +1 @@
-__all__ = ["GlossTxt", "GlossEntry", "GreatGloss"]
+__all__ = ["GlossTxt", "GlossEntry", "GreatGloss", "GlossLink", "GlossCache", "GlossLoad", "GlossStats", "GlossCollate", "GlossFormat", "GlossGraph", "GlossSnapshot", "GlossCLI", "GlossWatch"]
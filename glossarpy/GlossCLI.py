@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import sys
+
+# Only what's needed to read the config and decide what is out of date is imported up here.
+# The rest of glossarpy is imported once there's a glossary to build, so a build where
+# nothing changed finishes about as fast as Python can start.
+
+CONFIG = "glossarpy.toml"
+STATE = ".glossarpy-state.json"  # written next to the config, records what each glossary was built from
+STATE_VERSION = 1
+
+# setting -> default, for each [[glossary]] table (or [defaults], which applies to all of them)
+SETTINGS = {
+    "title": None,  # required
+    "sources": None,  # required: CSV, JSON Lines, TOML, or Python files
+    "output": None,  # required
+    "format": "rst",
+    "columns": 3,
+    "skipTOC": False,
+    "skipSource": False,
+    "sourcefile": None,  # defaults to the sources, as written in the config
+    "timestamp": False,
+    "collation": "upper",  # or false to keep entries in the order they were loaded
+    "duplicates": "error",
+    "cache": None,
+    "toc": None,  # also write a TOC to this file
+    "tocFormat": "txt",
+    "tocColumns": 0,
+    "depends": [],  # other files that should trigger a rebuild, such as modules a Python source imports
+}
+REQUIRED = ("title", "sources", "output")
+
+
+class ConfigError(ValueError):
+    '''Something wrong with the config file'''
+
+
+def _read_config(path:str):
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except ValueError as e:
+                raise ConfigError(f"{path}: invalid JSON: {e}") from None
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        try:
+            import tomli as tomllib  # type: ignore
+        except ImportError:
+            raise ImportError("Reading a TOML config needs Python 3.11 or newer, or the tomli package; "
+                "or write the config as JSON") from None
+    with open(path, "rb") as f:
+        try:
+            return tomllib.load(f)
+        except tomllib.TOMLDecodeError as e:
+            raise ConfigError(f"{path}: invalid TOML: {e}") from None
+
+
+def load_config(path:str):
+    '''Return a list of build settings, one dict per glossary in the config file at path, with
+    defaults filled in and file paths made relative to the current directory'''
+    config = _read_config(path)
+    base = os.path.dirname(path)
+    defaults = config.get("defaults", {})
+    glossaries = config.get("glossary", [])
+    if not isinstance(glossaries, list) or not glossaries:
+        raise ConfigError(f"{path}: no glossaries; add a [[glossary]] table for each one")
+    builds = []
+    for number, glossary in enumerate(glossaries, start=1):
+        settings = dict(SETTINGS)
+        for table in (defaults, glossary):
+            for key, value in table.items():
+                if key not in SETTINGS:
+                    raise ConfigError(f"{path}: glossary {number}: unknown setting {key!r}")
+                settings[key] = value
+        for key in REQUIRED:
+            if not settings[key]:
+                raise ConfigError(f"{path}: glossary {number}: missing {key}")
+        if isinstance(settings["sources"], str):
+            settings["sources"] = [settings["sources"]]
+        if settings["sourcefile"] is None:
+            settings["sourcefile"] = ", ".join(settings["sources"])
+        for key in ("output", "cache", "toc"):
+            if settings[key]:
+                settings[key] = os.path.join(base, settings[key])
+        for key in ("sources", "depends"):
+            settings[key] = [os.path.join(base, source) for source in settings[key]]
+        builds.append(settings)
+    outputs = [settings["output"] for settings in builds]
+    for output in outputs:
+        if outputs.count(output) > 1:
+            raise ConfigError(f"{path}: more than one glossary is written to {output}")
+    return builds
+
+
+def file_stamp(path:str):
+    '''Return (modification time in nanoseconds, size) of path, or None if it can't be read'''
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def fingerprint(settings:dict):
+    '''What a glossary's outputs depend on: its settings, plus the size and modification time of
+    its sources and of the outputs themselves. If this hasn't changed, neither have the outputs.'''
+    files = settings["sources"] + settings["depends"] + [settings["output"]]
+    if settings["toc"]:
+        files.append(settings["toc"])
+    stamps = {path: file_stamp(path) for path in files}
+    # as lists, to compare equal to what was read back from the JSON state file
+    return {"settings": settings, "files": {path: stamp and list(stamp) for path, stamp in stamps.items()}}
+
+
+def build(settings:dict):
+    '''Build one glossary from its settings (see load_config()). Returns (files changed, link
+    errors), where each link error is a message. Lives at module level so process pools can
+    pickle it.'''
+    import warnings
+    from . import GlossLink
+    from . import GlossLoad
+    from . import GreatGloss
+    warnings.simplefilter("ignore", GlossLink.GlossLinkWarning)  # reported as link errors instead
+    collation = settings["collation"] or None
+    glossary = GreatGloss.GreatGloss(settings["title"], duplicates=settings["duplicates"], collation=collation)
+    shared: dict = {}
+    for source in settings["sources"]:
+        GlossLoad.add_file(glossary, source, shared)
+
+    errors = []
+    for entry in glossary.glosslist:
+        for diagnostic in entry.check_links():
+            errors.append(f"{settings['output']}: {entry.name}: {diagnostic}")
+    for name, field, target in glossary.link_graph().dangling_links():
+        errors.append(f"{settings['output']}: {name}: {field} links to {target!r}, which isn't in the glossary")
+
+    changed = []
+    if glossary.write_glossary(settings["output"], format=settings["format"], skipTOC=settings["skipTOC"],
+            skipSource=settings["skipSource"], sourcefile=settings["sourcefile"], append=False,
+            columns=settings["columns"], timestamp=settings["timestamp"], cache=settings["cache"]):
+        changed.append(settings["output"])
+    if settings["toc"] and glossary.write_toc(settings["toc"], format=settings["tocFormat"], columns=settings["tocColumns"],
+            skipSource=settings["skipSource"], sourcefile=settings["sourcefile"], append=False):
+        changed.append(settings["toc"])
+    return changed, errors
+
+
+def _read_state(path:str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        return {}
+    return state.get("built", {})
+
+
+def _write_state(path:str, built:dict):
+    from . import GlossCache
+    GlossCache.write_atomic(path, json.dumps({"version": STATE_VERSION, "built": built}, indent=1, sort_keys=True),
+        encoding="utf-8")
+
+
+def _pool(jobs:int, threads:bool):
+    import concurrent.futures
+    if threads:
+        return concurrent.futures.ThreadPoolExecutor(max_workers=jobs)
+    return concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+
+
+def run_build(config:str, jobs:int = 1, threads:bool = False, force:bool = False, allow_link_errors:bool = False,
+        quiet:bool = False):
+    '''Build every glossary in config that is out of date, up to jobs at a time, and return
+    the exit status: 0 if all went well, 1 if any glossary failed or has link errors'''
+    builds = load_config(config)
+    state_path = os.path.join(os.path.dirname(config), STATE)
+    state = _read_state(state_path)
+    todo = [settings for settings in builds if force or state.get(settings["output"]) != fingerprint(settings)]
+    for settings in builds:
+        if settings not in todo and not quiet:
+            print(f"{settings['output']} is up to date")
+    if not todo:
+        return 0
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+
+    status = 0
+    if jobs <= 1 or len(todo) == 1:
+        results = []
+        for settings in todo:
+            try:
+                results.append((settings, build(settings), None))
+            except Exception as e:
+                results.append((settings, None, e))
+    else:
+        with _pool(min(jobs, len(todo)), threads) as pool:
+            futures = [(settings, pool.submit(build, settings)) for settings in todo]
+            results = []
+            for settings, future in futures:
+                try:
+                    results.append((settings, future.result(), None))
+                except Exception as e:
+                    results.append((settings, None, e))
+
+    for settings, result, error in results:
+        output = settings["output"]
+        if error is not None:
+            print(f"{output}: failed: {error}", file=sys.stderr)
+            state.pop(output, None)
+            status = 1
+            continue
+        changed, errors = result
+        for message in errors:
+            print(message, file=sys.stderr)
+        if errors:
+            # so the next build checks it again instead of skipping it
+            state.pop(output, None)
+            if not allow_link_errors:
+                status = 1
+        else:
+            state[output] = fingerprint(settings)
+        if not quiet:
+            print(f"{output} {'written' if changed else 'unchanged'}" + (f", {len(errors)} link errors" if errors else ""))
+    _write_state(state_path, state)
+    return status
+
+
+def run_watch(config:str, interval:float = 0.05):
+    '''Build every glossary in config, then update them whenever their sources change, until
+    interrupted with Ctrl-C'''
+    import warnings
+    from . import GlossLink
+    from . import GlossWatch
+    warnings.simplefilter("ignore", GlossLink.GlossLinkWarning)  # reported as link errors instead
+    builds = load_config(config)
+    try:
+        GlossWatch.watch(builds, interval=interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv:list = None):
+    parser = argparse.ArgumentParser(prog="glossarpy", description="Build glossaries from a config file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_command = commands.add_parser("build", help="build every glossary listed in a config file")
+    build_command.add_argument("config", nargs="?", default=CONFIG, help=f"TOML or JSON config file (default: {CONFIG})")
+    build_command.add_argument("-j", "--jobs", type=int, default=1,
+        help="build this many glossaries at the same time; 0 for one per CPU (default: 1)")
+    build_command.add_argument("--threads", action="store_true", help="use threads instead of processes for --jobs")
+    build_command.add_argument("--force", action="store_true", help="rebuild glossaries even if nothing changed")
+    build_command.add_argument("--allow-link-errors", action="store_true",
+        help="report malformed and dangling links, but don't fail because of them")
+    build_command.add_argument("-q", "--quiet", action="store_true", help="only print errors")
+    watch_command = commands.add_parser("watch", help="build every glossary in a config file, then keep them up to date as their sources change")
+    watch_command.add_argument("config", nargs="?", default=CONFIG, help=f"TOML or JSON config file (default: {CONFIG})")
+    watch_command.add_argument("--interval", type=float, default=0.05,
+        help="how often to check the sources for changes, in seconds (default: 0.05)")
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "watch":
+            return run_watch(args.config, interval=args.interval)
+        return run_build(args.config, jobs=args.jobs, threads=args.threads, force=args.force,
+            allow_link_errors=args.allow_link_errors, quiet=args.quiet)
+    except (ConfigError, OSError) as e:
+        print(f"glossarpy: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
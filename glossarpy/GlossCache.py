@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import tempfile
+from . import GlossEntry
+from . import GlossFormat
+
+CACHE_VERSION = 2  # bump whenever a change to glossarpy changes what an entry renders to
+
+
+class GlossCache:
+    '''On-disk cache of rendered entries, so rebuilding a glossary only re-renders the entries
+    that changed. Each fragment is stored under a hash of the entry's fields plus the format
+    and timestamp settings it was rendered with, and the renderer registered for that format
+    (see GlossFormat.Renderer.version). Use one cache file per glossary: save() drops
+    any fragment that wasn't used since the cache was opened.'''
+    def __init__(self, path:str):
+        self.path: str = path
+        self.hits: int = 0
+        self.misses: int = 0
+        self._stored: dict = {}  # fragments loaded from disk
+        self._used: dict = {}  # fragments used (or rendered) since opening
+        self.load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.save()
+
+    def load(self):
+        '''Read fragments from self.path. A missing, unreadable, or outdated cache file is
+        treated as empty rather than as an error, since everything can be rebuilt anyway.'''
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(stored, dict) and stored.get("version") == CACHE_VERSION:
+            self._stored = stored.get("fragments", {})
+
+    def save(self):
+        '''Atomically write every fragment used since the cache was opened to self.path'''
+        write_atomic(self.path, json.dumps({"version": CACHE_VERSION, "fragments": self._used}, separators=(",", ":")),
+            encoding="utf-8")
+        self._stored = self._used
+        self._used = {}
+
+    def key(self, entry, format:str = "rst", timestamp:bool = False):
+        '''Return the hash identifying entry rendered with these settings'''
+        renderer = GlossFormat.get_format(format)
+        parts = [str(getattr(entry, field)) for field in GlossEntry.TEXT_FIELDS]
+        parts.extend([renderer.name, type(renderer).__module__, type(renderer).__qualname__, str(renderer.version),
+            str(timestamp), str(CACHE_VERSION)])
+        if timestamp:
+            parts.append(str(entry.updated))
+        return hashlib.sha1("\x1f".join(parts).encode("utf-8", "surrogatepass")).hexdigest()
+
+    def lookup(self, key:str):
+        '''Return the fragment stored under key, or None if there isn't one'''
+        fragment = self._used.get(key)
+        if fragment is None:
+            fragment = self._stored.get(key)
+            if fragment is None:
+                self.misses += 1
+                return None
+            self._used[key] = fragment
+        self.hits += 1
+        return fragment
+
+    def store(self, key:str, fragment:str):
+        '''Remember a freshly rendered fragment under key'''
+        self._used[key] = fragment
+
+    def render(self, entry, format:str = "rst", timestamp:bool = False):
+        '''Return the rendered entry, from the cache if possible'''
+        key = self.key(entry, format, timestamp)
+        fragment = self.lookup(key)
+        if fragment is None:
+            fragment = entry.generate(format=format, timestamp=timestamp)
+            self.store(key, fragment)
+        return fragment
+
+
+def write_if_changed(path:str, fragments, write):
+    '''Write fragments to a temporary file next to path using write(stream, fragments), then move
+    it over path only if the bytes differ from what is already there. Unchanged files keep their
+    modification time, so tools like Sphinx don't rebuild them. Returns True if path was replaced.'''
+    temporary = _temporary(path, lambda f: write(f, fragments))
+    try:
+        if _same_bytes(temporary, path):
+            os.unlink(temporary)
+            return False
+        _install(temporary, path)
+    except BaseException:
+        _discard(temporary)
+        raise
+    return True
+
+
+def write_atomic(path:str, text, encoding:str = None):
+    '''Replace path with text in one go, without comparing it to what is already there. text is
+    a str, bytes, or a list of either to be written one after another.'''
+    chunks = [text] if isinstance(text, (str, bytes, bytearray)) else text
+    binary = bool(chunks) and not isinstance(chunks[0], str)
+    temporary = _temporary(path, lambda f: f.writelines(chunks), "wb" if binary else "w", encoding)
+    try:
+        _install(temporary, path)
+    except BaseException:
+        _discard(temporary)
+        raise
+
+
+def _temporary(path:str, write, mode:str = "w", encoding:str = None):
+    '''Call write(stream) on a new temporary file next to path, and return the file's name.
+    If write() fails, the temporary file is removed before the error is raised.'''
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(mode, encoding=encoding, dir=directory, delete=False, suffix=".tmp") as f:
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            _discard(f.name)
+            raise
+    return f.name
+
+
+def _discard(temporary:str):
+    if os.path.exists(temporary):
+        os.unlink(temporary)
+
+
+def _install(temporary:str, path:str):
+    '''Move temporary over path, giving it path's permissions, or the usual ones for a new file'''
+    try:
+        os.chmod(temporary, os.stat(path).st_mode & 0o777)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary, 0o666 & ~umask)
+    os.replace(temporary, path)
+
+
+def _same_bytes(first:str, second:str, chunksize:int = 1 << 16):
+    try:
+        if os.path.getsize(first) != os.path.getsize(second):
+            return False
+        with open(first, "rb") as a, open(second, "rb") as b:
+            while True:
+                chunk = a.read(chunksize)
+                if chunk != b.read(chunksize):
+                    return False
+                if not chunk:
+                    return True
+    except FileNotFoundError:
+        return False
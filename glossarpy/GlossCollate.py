@@ -0,0 +1,56 @@
+import re
+
+_DIGITS = re.compile(r"(\d+)")
+_LEADING_PUNCTUATION = re.compile(r"^[\W_]+")
+
+
+def exact(name:str):
+    '''Default Python ordering (ex: anaconda bat zebra Anacondas)'''
+    return name
+
+
+def upper(name:str):
+    '''Treat capital and lowercase letters as equivalent, the way sort_entries() always has'''
+    return name.upper()
+
+
+def casefold(name:str):
+    '''Like upper, but also treats letters like ß and ss as equivalent. Ties are broken by the
+    exact name, so the order doesn't depend on which entry was added first.'''
+    return (name.casefold(), name)
+
+
+def natural(name:str):
+    '''Casefolded, with runs of digits compared as numbers (ex: v2 before v10)'''
+    parts = _DIGITS.split(name.casefold())
+    return (tuple(int(part) if i % 2 else part for i, part in enumerate(parts)), name)
+
+
+def nopunct(name:str):
+    '''Casefolded, ignoring punctuation at the start of the name (ex: .bashrc sorts under b)'''
+    return (_LEADING_PUNCTUATION.sub("", name).casefold(), name)
+
+
+COLLATIONS = {
+    "exact": exact,
+    "upper": upper,
+    "casefold": casefold,
+    "natural": natural,
+    "nopunct": nopunct,
+}
+
+
+def register_collation(name:str, key):
+    '''Make key, a function that takes an entry's name and returns something sortable,
+    available as a collation called name'''
+    COLLATIONS[name] = key
+
+
+def get_collation(collation):
+    '''Return the key function for a collation name, or collation itself if it's a function'''
+    if callable(collation):
+        return collation
+    try:
+        return COLLATIONS[collation]
+    except KeyError:
+        raise ValueError(f"Unknown collation {collation!r}, expected one of {sorted(COLLATIONS)} or a function") from None
@@ -1,11 +1,20 @@
 import datetime
+from . import GlossFormat
+from . import GlossLink
 from . import GlossTxt
 
+FIELDS = ("name", "acronym_full", "definition", "furtherreading", "institute", "pronunciation", "seealso", "updated")
+TEXT_FIELDS = FIELDS[:-1]  # the fields that hold strings
+SHARED_FIELDS = ("acronym_full", "furtherreading", "institute", "pronunciation", "seealso", "updated")  # often repeated
+
 
 class GlossEntry(GlossTxt.GlossTxt):
     '''Object for an individual glossary entry'''
+    # no per-entry __dict__, which matters once a glossary has hundreds of thousands of entries
+    __slots__ = FIELDS + ("_rendered",)
+
     def __init__(self, name, acronym_full="", definition="", furtherreading="", institute="",
-            pronunciation="", seealso="", updated=datetime.date.today()):
+            pronunciation="", seealso="", updated=None):
         '''
         name - entry's name; spaces are supported, do not use [brackets]
         acronym_full - if acronym, what is the full name. if blank, assumed to not be an acronym.
@@ -13,7 +22,7 @@ class GlossEntry(GlossTxt.GlossTxt):
         institute - which institution is the phrase associated with?
         pronunciation - pronunciation (ex: wdl - "widdle")
         seealso - related but not equivalent entries, such as CLI being related to Dockstore CLI.
-        updated - when the entry was last updated
+        updated - when the entry was last updated, defaults to today
 
         When outputting to RST, acronym_full and definition will replace text in [brackets]
         with a working internal hyperlink to another entry. For example, if self.definition="I use
@@ -27,7 +36,44 @@ class GlossEntry(GlossTxt.GlossTxt):
         self.institute: bool = institute
         self.pronunciation: str = pronunciation
         self.seealso: str = seealso
-        self.updated: datetime = updated
+        self.updated: datetime = updated if updated is not None else datetime.date.today()
+        self._rendered: dict = None  # see keep_rendered()
+
+    def __getstate__(self):
+        # what the entry rendered to isn't worth copying, or sending to another process
+        state = {field: getattr(self, field) for field in self.__slots__}
+        state["_rendered"] = None if self._rendered is None else {}
+        return (None, state)
+
+    def __setstate__(self, state):
+        for field, value in state[1].items():
+            setattr(self, field, value)
+        if "_rendered" not in state[1]:  # pickled before entries could keep what they rendered to
+            self._rendered = None
+
+    def keep_rendered(self, keep:bool = True):
+        '''Start remembering what the fields that hold [links] render to in each format, so
+        rendering the entry again only processes the links of fields that have changed since.
+        Nothing needs clearing after you edit the entry: each fragment is kept along with the
+        values it was rendered from, and rendered again as soon as they differ. keep=False
+        stops remembering and frees what was kept.'''
+        if not keep:
+            self._rendered = None
+        elif self._rendered is None:
+            self._rendered = {}
+
+    def remembered(self, key, values, render):
+        '''Return render(self). If the entry is keeping what it renders to, the result is kept
+        under key along with values, and returned again for as long as values stay the same.'''
+        kept = self._rendered
+        if kept is None:
+            return render(self)
+        found = kept.get(key)
+        if found is not None and found[0] == values:
+            return found[1]
+        fragment = render(self)
+        kept[key] = (values, fragment)
+        return fragment
 
     def return_name(self, nospaces:bool = False):
         '''Returns name of the entry'''
@@ -50,137 +96,56 @@ class GlossEntry(GlossTxt.GlossTxt):
 
     def text_pronunciation(self, format:str = "txt"):
         '''Return pronunciation'''
-        if format == "txt":
-            return f"[pronounced {self.pronunciation}]\n"
-        elif format == "rst":
-            return f"[pronounced {self.pronunciation}]  \n\n"
+        return GlossFormat.get_format(format).fragment(self, "pronunciation")
 
     def text_acronym(self, format:str = "txt"):
-        '''Return acronym's full form, in italics if RST. We need an extra newline in RST to prevent
-        the acronym from being considered a header relative to the definition.'''
-        if format == "txt":
-            return f"abbreviation for {self.acronym_full}\n"
-        elif format == "rst":
-            words = self.acronym_full.split()
-            return f"*abbreviation for* {self.rst_process_brackets(words)}  \n\n"
+        '''Return acronym's full form, in italics if RST'''
+        return GlossFormat.get_format(format).fragment(self, "acronym_full")
 
     def text_definition(self, format:str = "txt"):
-        '''Return the definition of the entry.
-        If RST, calls a function that turns bracketed [text] into internal links.
-        Limitations: RST does not support letters coming after a link without a puncuation mark.'''
-        if format == "txt":
-            return f"    {self.definition}\n"
-        elif format == "rst":
-            words = self.definition.split()
-            processed_with_links = self.rst_process_brackets(words)
-            return f"    {processed_with_links}  \n\n"
+        '''Return the definition of the entry, with bracketed [text] turned into internal links
+        in formats that support them'''
+        return GlossFormat.get_format(format).fragment(self, "definition")
 
     def text_institute(self, format:str = "txt"):
         '''Return a caveat about how this term may mean something else outside the context of
         self.institute. In RST form this becomes a note block.'''
-        if format == "txt":
-            return f"This term as we define it here is associated with {self.institute} and may have different definitions in other contexts.\n"
-        elif format == "rst":
-            return f".. note:: This term as we define it here is associated with {self.institute} and may have different definitions in other contexts.  \n"
+        return GlossFormat.get_format(format).fragment(self, "institute")
 
     def text_seealso(self, format:str = "txt"):
-        '''Returns the entry's seealso information, which links to another entry.
-        There is a supposedly simplier way to do this with sphinx.ext.autosectionlabel, via:
-            see also :ref:`{self.seealso}`
-        ...but using extension often requires people reformat tons of links. For example, in
-        Dockstore's documentation, loading sphinx.ext.autosectionlabel raises 175 new errors.'''
-        if format == "txt":
-            return f"see also {self.seealso}\n"
-        elif format == "rst":
-            words = self.seealso.split()
-            processed_with_links = self.rst_process_brackets(words)
-
-            # if there is an institute, it's a good idea to include an extra newline. it's
-            # not strictly necessary to render properly, but without it, a warning will be thrown
-            if self.institute == "":
-                return f"see also {processed_with_links}  \n"
-            else:
-                return f"\nsee also {processed_with_links}  \n"
+        '''Returns the entry's seealso information, which links to another entry'''
+        return GlossFormat.get_format(format).fragment(self, "seealso")
 
     def text_furtherreading(self, format:str = "txt"):
-        '''Returns the entry's further reading section, which is a single URL.
-        In RST, if there is a see also, we need an extra newline in further reading.'''
-        if format == "txt":
-            return f"Further reading: {self.furtherreading}\n"
-        elif format == "rst":
-            furtherreading = []
-
-            # start with extra newline if necessary
-            if self.seealso == "" and self.institute == "":
-                pass
-            else:
-                furtherreading.append("\n")
-
-            furtherreading.append("Further reading: ")
-
-            # check if link is internal or external
-            if (self.furtherreading.startswith("https://")
-                    or self.furtherreading.startswith("http://")
-                    or self.furtherreading.startswith("www")):
-                # assume external link
-                furtherreading.append(f"{self.rst_url(self.furtherreading)}  \n")
-            else:
-                # assume internal documentation link
-                furtherreading.append(f"{self.rst_url(self.furtherreading, internal=True)}  \n")
-
-            return "".join(furtherreading)
+        '''Returns the entry's further reading section, which is a single URL'''
+        return GlossFormat.get_format(format).fragment(self, "furtherreading")
 
     def text_updated(self, format:str = "txt"):
-        '''Return when entry was last updated (visibly if txt, as a comment if RST)
-        Caveat: This isn't very helpful if you keep all of your entries in the same file and
-        parse all of them at the same time.'''
-        if format == "txt":
-            return self.updated.strftime("updated %Y-%m-%d\n")
-        elif format == "rst":
-            return self.updated.strftime("\n.. updated %Y-%m-%d  \n\n\n\n")
+        '''Return when entry was last updated (visibly if txt, as a comment if RST)'''
+        return GlossFormat.get_format(format).updated(self)
+
+    def check_links(self):
+        '''Return a list of GlossLink.LinkDiagnostic for every malformed or unterminated [link]
+        in the fields that support links, without rendering anything'''
+        diagnostics = []
+        for field in ("acronym_full", "definition", "seealso"):
+            text = getattr(self, field)
+            if "[" in text or "]" in text:
+                found: list = []
+                for _ in GlossLink.iter_tokens(text, found):
+                    pass
+                diagnostics.extend(diagnostic._replace(field=field) for diagnostic in found)
+        return diagnostics
 
     def generate_plaintext(self, timestamp:bool = False):
         '''Generate plaintext output of this entry'''
-        plaintext = []
-        plaintext.append(self.text_entry_title())
-        if self.pronunciation != "":
-            plaintext.append(self.text_pronunciation())
-        if self.acronym_full != "":
-            plaintext.append(self.text_acronym())
-        if self.definition != "":
-            plaintext.append(self.text_definition())
-        if self.institute != "":
-            plaintext.append(self.text_institute())
-        if self.seealso != "":
-            plaintext.append(self.text_seealso())
-        if self.furtherreading != "":
-            plaintext.append(self.text_furtherreading())
-        if timestamp:
-            plaintext.append(self.text_updated())
-        else:
-            plaintext.append("\n\n\n")
-        return "".join(plaintext)
+        return GlossFormat.get_format("txt").render(self, timestamp)
 
     def generate_RST(self, timestamp:bool = False):
         '''Generate RST output of this entry'''
-        rst = []
-        rst.append(self.rst_bookmark())
-        rst.append(self.text_entry_title())
-        if self.pronunciation != "":
-            rst.append(self.text_pronunciation(format="rst"))
-        if self.acronym_full != "":
-            rst.append(self.text_acronym(format="rst"))
-        if self.definition != "":
-            rst.append(self.text_definition(format="rst"))
-        if self.institute != "":
-            rst.append(self.text_institute(format="rst"))
-        if self.seealso != "":
-            rst.append(self.text_seealso(format="rst"))
-        if self.furtherreading != "":
-            rst.append(self.text_furtherreading(format="rst"))
-        if timestamp:
-            rst.append(self.text_updated(format="rst"))
-        else:
-            # minimum of one newline needed to keep rst bookmarks working
-            rst.append("\n\n\n")
-        return "".join(rst)
+        return GlossFormat.get_format("rst").render(self, timestamp)
+
+    def generate(self, format:str = "rst", timestamp:bool = False):
+        '''Generate output of this entry in any format registered with GlossFormat, such as
+        "rst", "txt", "md", or "html". Raises a ValueError for unknown formats.'''
+        return GlossFormat.get_format(format).render(self, timestamp)
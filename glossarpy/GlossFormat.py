@@ -0,0 +1,439 @@
+import html
+import operator
+import re
+import warnings
+from . import GlossLink
+
+# the fields of a GlossEntry that renderers have a method for, in the order they are output
+FIELDS = ("pronunciation", "acronym_full", "definition", "institute", "seealso", "furtherreading")
+INSTITUTE_NOTE = "This term as we define it here is associated with {} and may have different definitions in other contexts."
+
+_ANCHOR = re.compile(r"[^\w]")
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]#|~])")
+_MARKDOWN_BLOCK = re.compile(r"^([-+]|\d+[.)])(?= |$)")  # would start a list at the start of a line
+
+
+def _is_external(url:str):
+    return url.startswith("https://") or url.startswith("http://") or url.startswith("www")
+
+
+def _url(url:str, extension:str):
+    '''Further reading URL as a link target: external URLs get a scheme if they lack one, and
+    anything else is assumed to be another page of the documentation'''
+    if url.startswith("www"):
+        return "https://" + url
+    return url if _is_external(url) else f"{url}.{extension}"
+
+
+def _anchor_character(match):
+    character = match.group()
+    return "-" if character == " " else "".join(f"%{byte:02X}" for byte in character.encode("utf-8"))
+
+
+def anchor(name:str):
+    '''Return the HTML id of an entry, for Markdown and HTML output (ex: "dict-seven-bridges").
+    Punctuation is percent-encoded rather than dropped, so "C", "C++" and "C#" each get their own.
+    Case is ignored, so [cat] still finds "Cat", as labels do in RST output.'''
+    return "dict-" + _ANCHOR.sub(_anchor_character, " ".join(name.lower().split()))
+
+
+def _markdown(text:str):
+    '''Escape text for Markdown, so it shows as written rather than as HTML or formatting'''
+    return _MARKDOWN_SPECIAL.sub(r"\\\1", html.escape(text, quote=False))
+
+
+def _markdown_block(text:str):
+    '''Escaped text that starts a line, as _markdown(), but that can't start a list either'''
+    return _MARKDOWN_BLOCK.sub(lambda match: match.group()[:-1] + "\\" + match.group()[-1], text)
+
+
+def _links(text:str, link, escape=None):
+    '''Render text with link(name, suffix) for each [link], escaping the rest with escape,
+    and collapse whitespace the same way RST output does'''
+    if "[" not in text and "]" not in text:
+        return " ".join((escape(text) if escape else text).split())
+    found: list = []
+    pieces = []
+    for token in GlossLink.iter_tokens(text, found):
+        if token.kind == GlossLink.LINK and token.closed:
+            pieces.append(link(" ".join(token.text.split()), escape(token.suffix) if escape else token.suffix))
+        elif token.kind == GlossLink.LINK:
+            pieces.append(escape("[" + token.text) if escape else "[" + token.text)
+        else:
+            pieces.append(escape(token.text) if escape else token.text)
+    for diagnostic in found:
+        warnings.warn(diagnostic.message, GlossLink.GlossLinkWarning, stacklevel=3)
+    return " ".join("".join(pieces).split())
+
+
+class Renderer:
+    '''How one output format renders a glossary. Subclass this and pass an instance to
+    register_format() to add a format. The defaults give plaintext output.
+
+    Each entry field has a method named after it that renders it, and is only called when that
+    field isn't empty. compile() puts these together once into a single function per format,
+    so rendering an entry doesn't have to work out which format it is in for every field.
+
+    For entries that keep what they render to (see GlossEntry.keep_rendered()), the fields in
+    remembered are only rendered again once a field they are rendered from changes. If your
+    method for one of them reads other fields too, list all of them in depends.
+
+    GlossCache files remember which renderer class rendered each entry, and its version. Bump
+    version whenever you change what your renderer outputs, so fragments rendered by the old
+    one aren't reused.'''
+    name = "txt"
+    extension = "txt"
+    version = 1
+    remembered = ("acronym_full", "definition", "seealso")  # the fields that can hold [links]
+    depends: dict = {}  # field -> every field its method reads, if that isn't just the field itself
+
+    def __init__(self):
+        self._compiled = None
+        self._fields: dict = None  # field -> what fragment() renders it with
+
+    # overall glossary
+    def start(self, title:str):
+        '''Return anything that must come before everything else, such as an HTML header'''
+        return ""
+
+    def end(self):
+        '''Return anything that must come after everything else'''
+        return ""
+
+    def source(self, message:str):
+        '''Return the note saying where the output came from'''
+        return message
+
+    def title(self, title:str):
+        '''Return the glossary's title, as a list of strings'''
+        return [f"{title}\n", "=" * len(title) + "\n"]
+
+    def heading(self, text:str):
+        '''Return a smaller heading, such as a shard name in an index page, as a list of strings'''
+        return [f"{text}\n", "-" * len(text) + "\n"]
+
+    def pages(self, pages:list):
+        '''Return links to other pages, given as (title, filename without extension) pairs, as a
+        list of strings. Used for the index page of a sharded glossary.'''
+        return []
+
+    def toc(self, entries, columns:int = 3, page:str = ""):
+        '''Yield the table of contents one line at a time: toc_start(), a toc_line() for each
+        entry, then toc_finish(). page is the file the entries are in, without extension, if
+        that isn't the file the TOC is in.'''
+        start = self.toc_start(columns)
+        if start:
+            yield start
+        for entry in entries:
+            yield self.toc_line(entry, page)
+        finish = self.toc_finish()
+        if finish:
+            yield finish
+
+    def toc_start(self, columns:int = 3):
+        '''Return whatever comes before the first line of the table of contents'''
+        return ""
+
+    def toc_line(self, entry, page:str = ""):
+        '''Return entry's line in the table of contents'''
+        return f"{entry.return_name()}\n"
+
+    def toc_finish(self):
+        '''Return whatever comes after the last line of the table of contents'''
+        return ""
+
+    def toc_end(self):
+        '''Return whatever separates the table of contents from the entries'''
+        return "\n"
+
+    # a single entry
+    def entry_start(self, entry):
+        return f"\n\n{entry.name}\n" + "-" * len(entry.name) + "\n"
+
+    def entry_end(self, entry):
+        return "\n\n\n"
+
+    def updated(self, entry):
+        return entry.updated.strftime("updated %Y-%m-%d\n")
+
+    def pronunciation(self, entry):
+        return f"[pronounced {entry.pronunciation}]\n"
+
+    def acronym_full(self, entry):
+        return f"abbreviation for {entry.acronym_full}\n"
+
+    def definition(self, entry):
+        return f"    {entry.definition}\n"
+
+    def institute(self, entry):
+        return INSTITUTE_NOTE.format(entry.institute) + "\n"
+
+    def seealso(self, entry):
+        return f"see also {entry.seealso}\n"
+
+    def furtherreading(self, entry):
+        return f"Further reading: {entry.furtherreading}\n"
+
+    def _remembering(self, field:str):
+        '''Return the method that renders field, wrapped so entries that keep what they render
+        to only call it when a field it depends on has changed'''
+        render = getattr(self, field)
+        if field not in self.remembered:
+            return render
+        key = (self, field)
+        values = operator.attrgetter(*self.depends.get(field, (field,)))
+
+        def remembered(entry):
+            return entry.remembered(key, values(entry), render)
+        return remembered
+
+    def fragment(self, entry, field:str):
+        '''Render one field of entry, reusing what it rendered to last time if it can'''
+        if self._fields is None:
+            self._fields = {name: self._remembering(name) for name in FIELDS}
+        return self._fields[field](entry)
+
+    def compile(self):
+        '''Return a function that renders an entry, rendering(entry, timestamp=False)'''
+        start = self.entry_start
+        end = self.entry_end
+        updated = self.updated
+        fields = tuple((operator.attrgetter(field), self._remembering(field)) for field in FIELDS)
+
+        def render(entry, timestamp:bool = False):
+            out = [start(entry)]
+            for value, fragment in fields:
+                if value(entry) != "":
+                    out.append(fragment(entry))
+            out.append(updated(entry) if timestamp else end(entry))
+            return "".join(out)
+        return render
+
+    def render(self, entry, timestamp:bool = False):
+        '''Render a whole entry'''
+        if self._compiled is None:
+            self._compiled = self.compile()
+        return self._compiled(entry, timestamp)
+
+
+class RSTRenderer(Renderer):
+    '''Sphinx-flavored reStructuredText, where every entry gets a bookmark that [links] point to'''
+    name = "rst"
+    extension = "rst"
+    depends = {"seealso": ("seealso", "institute")}
+
+    def source(self, message:str):
+        return f".. {message}\n"
+
+    def pages(self, pages:list):
+        return [".. toctree:: \n\t:maxdepth: 1\n\n"] + [f"\t{page}\n" for _, page in pages] + ["\n"]
+
+    def toc_start(self, columns:int = 3):
+        '''if columns>=1: number of hlist columns to use
+        if columns<=0: use Sphinx built in local TOC instead of hlist'''
+        if columns <= 0:
+            return ".. contents:: Table of Contents \n\t:local:\n\n"
+        return f".. hlist:: \n\t:columns: {columns}\n\n"
+
+    def toc_line(self, entry, page:str = ""):
+        # remember: rst_process_brackets() expects input as a list, not str!
+        return f"\t* {entry.rst_process_brackets([f'[{entry.return_name()}]'])}\n"
+
+    def entry_start(self, entry):
+        # keep space between entries big enough to keep RST happy
+        return f".. _dict {entry.name}:\n\n{entry.name}\n" + "-" * len(entry.name) + "\n"
+
+    def entry_end(self, entry):
+        # minimum of one newline needed to keep rst bookmarks working
+        return "\n\n\n"
+
+    def updated(self, entry):
+        '''Shown as a comment. This isn't very helpful if you keep all of your entries in the
+        same file and parse all of them at the same time.'''
+        return entry.updated.strftime("\n.. updated %Y-%m-%d  \n\n\n\n")
+
+    def pronunciation(self, entry):
+        return f"[pronounced {entry.pronunciation}]  \n\n"
+
+    def acronym_full(self, entry):
+        '''In italics. We need an extra newline to prevent the acronym from being considered a
+        header relative to the definition.'''
+        return f"*abbreviation for* {GlossLink.rst_links(entry.acronym_full)}  \n\n"
+
+    def definition(self, entry):
+        '''Limitations: RST does not support letters coming after a link without a puncuation mark.'''
+        return f"    {GlossLink.rst_links(entry.definition)}  \n\n"
+
+    def institute(self, entry):
+        return f".. note:: {INSTITUTE_NOTE.format(entry.institute)}  \n"
+
+    def seealso(self, entry):
+        '''There is a supposedly simplier way to do this with sphinx.ext.autosectionlabel, via:
+            see also :ref:`{self.seealso}`
+        ...but using extension often requires people reformat tons of links. For example, in
+        Dockstore's documentation, loading sphinx.ext.autosectionlabel raises 175 new errors.'''
+        # if there is an institute, it's a good idea to include an extra newline. it's
+        # not strictly necessary to render properly, but without it, a warning will be thrown
+        if entry.institute == "":
+            return f"see also {GlossLink.rst_links(entry.seealso)}  \n"
+        return f"\nsee also {GlossLink.rst_links(entry.seealso)}  \n"
+
+    def furtherreading(self, entry):
+        '''External URLs become links; anything else is assumed to be an internal documentation
+        page. If there is a see also or institute note, we need an extra newline first.'''
+        newline = "" if entry.seealso == "" and entry.institute == "" else "\n"
+        if _is_external(entry.furtherreading):
+            return f"{newline}Further reading: `<{entry.furtherreading}>`_  \n"
+        return f"{newline}Further reading: :doc:`{entry.furtherreading} <{entry.furtherreading}>`  \n"
+
+
+class MarkdownRenderer(Renderer):
+    '''Markdown, with an anchor before every entry that [links] point to'''
+    name = "md"
+    extension = "md"
+    version = 2
+
+    def source(self, message:str):
+        return f"<!-- {message.rstrip()} -->\n\n"
+
+    def title(self, title:str):
+        return [f"# {_markdown(title)}\n", "\n"]
+
+    def heading(self, text:str):
+        return [f"## {_markdown(text)}\n", "\n"]
+
+    def pages(self, pages:list):
+        return [f"- [{_markdown(title)}]({page}.md)\n" for title, page in pages] + ["\n"]
+
+    def toc_line(self, entry, page:str = ""):
+        page = f"{page}.md" if page else ""
+        return f"- [{_markdown(entry.name)}]({page}#{anchor(entry.name)})\n"
+
+    def _link(self, name:str, suffix:str):
+        return f"[{_markdown(name)}](#{anchor(name)}){suffix}"
+
+    def entry_start(self, entry):
+        return f'<a id="{anchor(entry.name)}"></a>\n\n### {_markdown(entry.name)}\n\n'
+
+    def entry_end(self, entry):
+        return "\n"
+
+    def updated(self, entry):
+        return entry.updated.strftime("<!-- updated %Y-%m-%d -->\n\n")
+
+    def pronunciation(self, entry):
+        return f"*pronounced {_markdown(entry.pronunciation)}*\n\n"
+
+    def acronym_full(self, entry):
+        return f"*abbreviation for* {_links(entry.acronym_full, self._link, _markdown)}\n\n"
+
+    def definition(self, entry):
+        return f"{_markdown_block(_links(entry.definition, self._link, _markdown))}\n\n"
+
+    def institute(self, entry):
+        return f"> **Note:** {_markdown(INSTITUTE_NOTE.format(entry.institute))}\n\n"
+
+    def seealso(self, entry):
+        return f"See also {_links(entry.seealso, self._link, _markdown)}\n\n"
+
+    def furtherreading(self, entry):
+        return f"Further reading: [{_markdown(entry.furtherreading)}]({_url(entry.furtherreading, 'md')})\n\n"
+
+
+class HTMLRenderer(Renderer):
+    '''A standalone HTML page, with an id on every entry that [links] point to'''
+    name = "html"
+    extension = "html"
+    version = 2
+
+    def start(self, title:str):
+        return (f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{html.escape(title)}</title>\n'
+            '</head>\n<body>\n')
+
+    def end(self):
+        return "</body>\n</html>\n"
+
+    def source(self, message:str):
+        return f"<!-- {html.escape(message.rstrip())} -->\n"
+
+    def title(self, title:str):
+        return [f"<h1>{html.escape(title)}</h1>\n"]
+
+    def heading(self, text:str):
+        return [f"<h2>{html.escape(text)}</h2>\n"]
+
+    def pages(self, pages:list):
+        links = [f'<li><a href="{html.escape(page)}.html">{html.escape(title)}</a></li>\n' for title, page in pages]
+        return ['<ul class="pages">\n'] + links + ["</ul>\n"]
+
+    def toc_start(self, columns:int = 3):
+        return '<ul class="toc">\n'
+
+    def toc_line(self, entry, page:str = ""):
+        page = html.escape(f"{page}.html") if page else ""
+        return f'<li><a href="{page}#{anchor(entry.name)}">{html.escape(entry.name)}</a></li>\n'
+
+    def toc_finish(self):
+        return "</ul>\n"
+
+    def _link(self, name:str, suffix:str):
+        return f'<a href="#{anchor(name)}">{html.escape(name)}</a>{suffix}'
+
+    def entry_start(self, entry):
+        return f'<section id="{anchor(entry.name)}">\n<h2>{html.escape(entry.name)}</h2>\n'
+
+    def entry_end(self, entry):
+        return "</section>\n"
+
+    def updated(self, entry):
+        return entry.updated.strftime("<!-- updated %Y-%m-%d -->\n</section>\n")
+
+    def pronunciation(self, entry):
+        return f'<p class="pronunciation">[pronounced {html.escape(entry.pronunciation)}]</p>\n'
+
+    def acronym_full(self, entry):
+        return f'<p class="acronym"><em>abbreviation for</em> {_links(entry.acronym_full, self._link, html.escape)}</p>\n'
+
+    def definition(self, entry):
+        return f'<p class="definition">{_links(entry.definition, self._link, html.escape)}</p>\n'
+
+    def institute(self, entry):
+        return f'<p class="note">{html.escape(INSTITUTE_NOTE.format(entry.institute))}</p>\n'
+
+    def seealso(self, entry):
+        return f'<p class="seealso">See also {_links(entry.seealso, self._link, html.escape)}</p>\n'
+
+    def furtherreading(self, entry):
+        url = _url(entry.furtherreading, "html")
+        return (f'<p class="furtherreading">Further reading: <a href="{html.escape(url)}">'
+            f'{html.escape(entry.furtherreading)}</a></p>\n')
+
+
+FORMATS: dict = {}
+
+
+def register_format(renderer:Renderer, aliases:tuple = ()):
+    '''Make renderer available under its name and any aliases, for every format= argument.
+    Registering a name that is already taken replaces the old renderer.'''
+    FORMATS[renderer.name] = renderer
+    for alias in aliases:
+        FORMATS[alias] = renderer
+
+
+def get_format(format:str):
+    '''Return the Renderer registered for format, raising a ValueError if there isn't one'''
+    try:
+        return FORMATS[format]
+    except KeyError:
+        raise ValueError(f"Unknown format {format!r}, expected one of {sorted(FORMATS)}") from None
+
+
+def is_rst(format:str):
+    '''Whether format is RST, or something registered as an alias for it'''
+    return FORMATS.get(format) is FORMATS["rst"]
+
+
+register_format(Renderer(), aliases=("TXT", "text", "plaintext"))
+register_format(RSTRenderer(), aliases=("RST",))
+register_format(MarkdownRenderer(), aliases=("markdown",))
+register_format(HTMLRenderer())
@@ -0,0 +1,270 @@
+import collections
+import json
+import math
+import re
+from . import GlossCache
+from . import GlossLink
+
+GRAPH_VERSION = 1  # bump whenever the saved format changes
+LINK_FIELDS = ("acronym_full", "definition", "seealso")  # fields that can hold [links]
+TEXT_FIELDS = ("name", "acronym_full", "definition", "institute", "seealso")  # fields search() looks at
+NAME_WEIGHT = 3  # a word in an entry's name counts as this many words elsewhere
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TERM = re.compile(r"\w+")
+
+
+def terms(text:str):
+    '''Split text into lowercase search terms, ignoring brackets and punctuation'''
+    return _TERM.findall(text.casefold())
+
+
+class GlossGraph:
+    '''Which entries link to which, plus an inverted index of the words in each entry, for a
+    whole glossary. GreatGloss.link_graph() builds one and keeps it up to date as entries are
+    added, removed and replaced, so asking for backlinks or searching never re-parses the
+    glossary. A graph can be saved with save() and read back with GlossGraph.load(), which
+    needs nothing but the file.'''
+    def __init__(self, entries=()):
+        self._links: dict = {}  # name -> {field: [names linked to]}, in the order entries were added
+        self._backlinks: dict = {}  # name linked to -> {name linking to it: number of links}; None until needed after load()
+        self._postings: dict = {}  # term -> {name: times it appears}
+        self._lengths: dict = {}  # name -> number of terms
+        self._total_length: int = 0
+        self._terms: dict = {}  # name -> terms it is indexed under; None after load() until needed
+        self._packed: dict = None  # term -> [name number, count, ...] as saved, unpacked into _postings as needed
+        self._packed_names: list = None
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self._links)
+
+    def __contains__(self, name):
+        return name in self._links
+
+    def add(self, entry):
+        '''Add an entry's links and words. An entry with the same name must be removed first.'''
+        name = entry.name
+        if name in self._links:
+            raise ValueError(f"Graph already has an entry named {name!r}")
+        self._unpack()
+        links = {}
+        for field in LINK_FIELDS:
+            text = getattr(entry, field)
+            if "[" in text:
+                targets = GlossLink.link_targets(text)
+                if targets:
+                    links[field] = targets
+        self._links[name] = links
+        self._add_backlinks(name, links)
+
+        counts = collections.Counter(terms(" ".join([getattr(entry, field) for field in TEXT_FIELDS[1:]])))
+        for term in terms(name):
+            counts[term] += NAME_WEIGHT
+        postings = self._postings
+        for term, count in counts.items():
+            posting = postings.get(term)
+            if posting is None:
+                postings[term] = {name: count}
+            else:
+                posting[name] = count
+        length = sum(counts.values())
+        self._lengths[name] = length
+        self._total_length += length
+        if self._terms is not None:
+            self._terms[name] = tuple(counts)
+
+    def remove(self, name:str):
+        '''Forget the entry called name'''
+        self._unpack()
+        indexed = self._indexed_terms().pop(name)
+        backlinks = self._backlink_index()
+        for targets in self._links.pop(name).values():
+            for target in targets:
+                sources = backlinks[target]
+                sources[name] -= 1
+                if not sources[name]:
+                    del sources[name]
+                    if not sources:
+                        del backlinks[target]
+        for term in indexed:
+            posting = self._postings[term]
+            del posting[name]
+            if not posting:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(name)
+
+    def replace(self, name:str, entry):
+        '''Swap the entry called name for entry'''
+        self.remove(name)
+        self.add(entry)
+
+    def _add_backlinks(self, name:str, links:dict):
+        backlinks = self._backlinks
+        for targets in links.values():
+            for target in targets:
+                sources = backlinks.get(target)
+                if sources is None:
+                    backlinks[target] = {name: 1}
+                else:
+                    sources[name] = sources.get(name, 0) + 1
+
+    def _backlink_index(self):
+        '''Return _backlinks, working it out from _links first if the graph came from load()'''
+        if self._backlinks is None:
+            self._backlinks = {}
+            for name, links in self._links.items():
+                self._add_backlinks(name, links)
+        return self._backlinks
+
+    def _posting(self, term:str):
+        '''Return {name: count} for term, unpacking it first if the graph came from load()'''
+        posting = self._postings.get(term)
+        if posting is None and self._packed is not None:
+            packed = self._packed.pop(term, None)
+            if packed is not None:
+                names = self._packed_names
+                posting = {names[packed[i]]: packed[i + 1] for i in range(0, len(packed), 2)}
+                self._postings[term] = posting
+        return posting
+
+    def _unpack(self):
+        self._backlink_index()
+        if self._packed is not None:
+            for term in list(self._packed):
+                self._posting(term)
+            self._packed = self._packed_names = None
+
+    def _indexed_terms(self):
+        self._unpack()
+        if self._terms is None:
+            self._terms = {name: [] for name in self._links}
+            for term, posting in self._postings.items():
+                for name in posting:
+                    self._terms[name].append(term)
+        return self._terms
+
+    def links(self, name:str):
+        '''Return the names of every entry the entry called name links to, in order'''
+        return [target for targets in self._links[name].values() for target in targets]
+
+    def backlinks(self, name:str):
+        '''Return the names of every entry that links to name, whether or not name is an entry'''
+        return list(self._backlink_index().get(name, ()))
+
+    def dangling_links(self):
+        '''Return (entry, field, target) for every link to an entry that doesn't exist'''
+        dangling = []
+        for name, links in self._links.items():
+            for field, targets in links.items():
+                dangling.extend((name, field, target) for target in targets if target not in self._links)
+        return dangling
+
+    def orphans(self):
+        '''Return the names of entries that no other entry links to'''
+        backlinks = self._backlink_index()
+        return [name for name in self._links if not set(backlinks.get(name, ())) - {name}]
+
+    def seealso_cycles(self):
+        '''Return every group of entries whose see alsos lead back to each other (ex: A sees B,
+        B sees C, C sees A), as lists of names. An entry that sees itself is a group of one.'''
+        edges = {name: [target for target in links.get("seealso", ()) if target in self._links]
+            for name, links in self._links.items()}
+        # Tarjan's strongly connected components, without recursion so long chains don't hit the limit
+        order: dict = {}
+        lowlink: dict = {}
+        stack: list = []
+        on_stack: set = set()
+        cycles = []
+        for root in edges:
+            if root in order:
+                continue
+            work = [(root, 0)]
+            while work:
+                name, i = work.pop()
+                if i == 0:
+                    order[name] = lowlink[name] = len(order)
+                    stack.append(name)
+                    on_stack.add(name)
+                targets = edges[name]
+                while i < len(targets):
+                    target = targets[i]
+                    i += 1
+                    if target not in order:
+                        work.append((name, i))
+                        work.append((target, 0))
+                        break
+                    if target in on_stack:
+                        lowlink[name] = min(lowlink[name], order[target])
+                else:
+                    if lowlink[name] == order[name]:
+                        group = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            group.append(member)
+                            if member == name:
+                                break
+                        if len(group) > 1 or name in targets:
+                            group.sort(key=order.get)
+                            cycles.append(group)
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[name])
+        return cycles
+
+    def search(self, query:str, limit:int = 10):
+        '''Return up to limit (name, score) pairs for the entries that best match query, best
+        first. Scores are BM25, with words in an entry's name counting extra.'''
+        if not self._lengths:
+            return []
+        average = self._total_length / len(self._lengths) or 1
+        scores: dict = {}
+        for term in set(terms(query)):
+            posting = self._posting(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (len(self._lengths) - len(posting) + 0.5) / (len(posting) + 0.5))
+            for name, count in posting.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[name] / average)
+                scores[name] = scores.get(name, 0.0) + idf * count * (BM25_K1 + 1) / (count + norm)
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], pair[0]))
+        return ranked[:limit] if limit else ranked
+
+    def save(self, path:str):
+        '''Atomically write the graph and search index to path as JSON. Entries are numbered so
+        each posting doesn't repeat their names, which keeps the file small and quick to load.'''
+        self._unpack()
+        numbers = {name: number for number, name in enumerate(self._links)}
+        postings = {}
+        for term, posting in self._postings.items():
+            packed = postings[term] = []
+            for name, count in posting.items():
+                packed.append(numbers[name])
+                packed.append(count)
+        # dumps() rather than dump(), which would encode it in pure Python a piece at a time
+        GlossCache.write_atomic(path, json.dumps({"version": GRAPH_VERSION, "names": list(self._links),
+            "links": list(self._links.values()), "lengths": [self._lengths[name] for name in self._links],
+            "postings": postings}, separators=(",", ":")), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path:str):
+        '''Read a graph written by save(). Raises a ValueError if it was written by a version of
+        glossarpy that saved graphs differently. Postings are only unpacked when a search needs
+        them, or all at once if the graph is changed.'''
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        if not isinstance(stored, dict) or stored.get("version") != GRAPH_VERSION:
+            raise ValueError(f"{path} is not a version {GRAPH_VERSION} glossarpy graph")
+        graph = cls()
+        names = stored["names"]
+        graph._links = dict(zip(names, stored["links"]))
+        graph._lengths = dict(zip(names, stored["lengths"]))
+        graph._total_length = sum(stored["lengths"])
+        graph._packed = stored["postings"]
+        graph._packed_names = names
+        graph._backlinks = None
+        graph._terms = None
+        return graph
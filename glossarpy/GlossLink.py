@@ -0,0 +1,240 @@
+import re
+import warnings
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# token kinds
+TEXT = "text"
+LINK = "link"
+MALFORMED = "malformed"
+
+_BRACKETED_WORD = re.compile(r"(?<!\S)\S*[\[\]]\S*")
+_MALFORMED = re.compile(r"\][a-zA-Z]")
+
+
+class LinkToken(NamedTuple):
+    '''One span of a field's text.
+    kind - TEXT, LINK, or MALFORMED (a word RST can't link, see LinkDiagnostic)
+    text - the text as written, whitespace included; for a LINK, the name of the entry being linked to
+    start, end - where the span sits in the original text
+    suffix - LINK only: anything stuck to the closing bracket, like the comma in "[cat],"
+    closed - LINK only: False if the closing bracket never showed up
+    words - the words of the token as the old word-by-word parser saw them; empty for TEXT
+        tokens that were never split into words'''
+    kind: str
+    text: str
+    start: int
+    end: int
+    suffix: str = ""
+    closed: bool = True
+    words: Tuple[str, ...] = ()
+
+
+class LinkDiagnostic(NamedTuple):
+    '''A problem found while looking for [links].
+    kind - "malformed" if letters come right after a closing bracket, "unterminated" if a link never closes
+    text - the word or link that caused the problem
+    start, end - where it sits in the original text
+    field - which GlossEntry field it came from, if known'''
+    kind: str
+    text: str
+    start: int
+    end: int
+    field: str = ""
+
+    @property
+    def message(self):
+        if self.kind == "malformed":
+            return (f"An entry will have an invalid internal link due RST limitations. Put some sort of "
+                f"whitespace or punctuation before any additional letters after the ending bracket. "
+                f"Problematic word: {self.text}")
+        return f"Link is missing its closing bracket: {self.text}"
+
+    def __str__(self):
+        location = f"{self.field} " if self.field else ""
+        return f"{location}[{self.start}:{self.end}] {self.message}"
+
+
+class GlossLinkWarning(UserWarning):
+    '''Raised through the warnings module for link problems nobody asked to collect'''
+
+
+def _scan(text:str, spans:Iterable, diagnostics:Optional[list]) -> Iterator[tuple]:
+    '''The link scanner everything else is built on. spans gives the (start, end) of each word
+    of text to look at on its own, in order; anything between them has no brackets in it.
+    A link starts at a word beginning with [ and runs until the first word containing ], or
+    until another link starts. Yields (kind, start, end, close, words) for each link and for
+    each word outside a link, but not for the plain text between them:
+        kind - TEXT, LINK or MALFORMED
+        start, end - where it sits in text; an unterminated link ends where its last word does
+        close - LINK only: where its closing bracket is, or -1 if it never closes
+        words - LINK only: its words as the old word-by-word parser saw them, without the
+            opening bracket, and without any malformed words'''
+    in_link = False
+    link_start = link_end = position = 0
+    words: List[str] = []
+    for start, end in spans:
+        if in_link and start > position:
+            gap = text[position:start].rstrip()
+            if gap:
+                words.extend(gap.split())
+                link_end = position + len(gap)
+        position = end
+        word = text[start:end]
+        if "[" not in word and "]" not in word:  # only when looking at every word
+            if in_link:
+                words.append(word)
+                link_end = start + len(word.rstrip())
+            else:
+                yield TEXT, start, end, -1, None
+        elif "]" in word and _MALFORMED.search(word):
+            if diagnostics is not None:
+                diagnostics.append(LinkDiagnostic("malformed", word, start, end))
+            if in_link:
+                link_end = end
+            else:
+                yield MALFORMED, start, end, -1, None
+        elif word[0] == "[":
+            if in_link:
+                yield _unterminated(text, link_start, link_end, words, diagnostics)
+            bracket = word.find("]")
+            if bracket >= 0:
+                in_link = False
+                yield LINK, start, end, start + bracket, [word[1:]]
+            else:
+                in_link = True
+                link_start = start
+                link_end = end
+                words = [word[1:]]
+        elif in_link:
+            words.append(word)
+            bracket = word.find("]")
+            if bracket >= 0:
+                in_link = False
+                yield LINK, link_start, end, start + bracket, words
+            else:
+                link_end = end
+        else:
+            yield TEXT, start, end, -1, None
+    if in_link:
+        gap = text[position:].rstrip()
+        if gap:
+            words.extend(gap.split())
+            link_end = position + len(gap)
+        yield _unterminated(text, link_start, link_end, words, diagnostics)
+
+
+def _unterminated(text:str, start:int, end:int, words:list, diagnostics:Optional[list]):
+    if diagnostics is not None:
+        diagnostics.append(LinkDiagnostic("unterminated", text[start:end], start, end))
+    return LINK, start, end, -1, words
+
+
+def _tokens(text:str, spans:Iterable, diagnostics:Optional[list]) -> Iterator[LinkToken]:
+    '''Turn what _scan() finds into tokens, with TEXT tokens for the text between them'''
+    position = 0
+    for kind, start, end, close, words in _scan(text, spans, diagnostics):
+        if start > position:
+            yield LinkToken(TEXT, text[position:start], position, start)
+        position = end
+        if kind == LINK:
+            if close >= 0:
+                yield LinkToken(LINK, text[start + 1:close], start, end, text[close + 1:end], True, tuple(words))
+            else:
+                yield LinkToken(LINK, text[start + 1:end], start, end, "", False, tuple(words))
+        else:
+            word = text[start:end]
+            yield LinkToken(kind, word, start, end, "", True, (word,))
+    if position < len(text):
+        yield LinkToken(TEXT, text[position:], position, len(text))
+
+
+def _bracketed_words(text:str):
+    return map(re.Match.span, _BRACKETED_WORD.finditer(text))
+
+
+def iter_tokens(text:str, diagnostics:Optional[list] = None) -> Iterator[LinkToken]:
+    '''Yield the tokens of a field in a single pass over its text. Only words with a bracket in
+    them are looked at individually; the text between them comes out as whole TEXT tokens.
+    If diagnostics is a list, any LinkDiagnostic found is appended to it.'''
+    return _tokens(text, _bracketed_words(text), diagnostics)
+
+
+def iter_word_tokens(words:list, diagnostics:Optional[list] = None) -> Iterator[LinkToken]:
+    '''Same as iter_tokens(), but for text that has already been split into a list of words.
+    Positions are counted as if the words were joined with single spaces.'''
+    spans = []
+    position = 0
+    for word in words:
+        spans.append((position, position + len(word)))
+        position += len(word) + 1
+    return _tokens(" ".join(words), spans, diagnostics)
+
+
+def link_targets(text:str, diagnostics:Optional[list] = None) -> List[str]:
+    '''Return the name of every entry that text links to, in order of appearance.
+    If diagnostics is a list, any LinkDiagnostic found is appended to it.'''
+    if "[" not in text and (diagnostics is None or "]" not in text):
+        return []
+    return [" ".join(text[start + 1:close if close >= 0 else end].split())
+        for kind, start, end, close, _ in _scan(text, _bracketed_words(text), diagnostics) if kind == LINK]
+
+
+def render_rst(tokens:Iterable[LinkToken], preserve_whitespace:bool = False):
+    '''Turn tokens into RST, with each link becoming a :ref: to that entry's bookmark.
+    By default words are joined with single spaces and malformed words are dropped, which is
+    what glossarpy has always done. With preserve_whitespace=True, the original spacing and
+    any malformed words are kept as they were written.'''
+    if preserve_whitespace:
+        out = []
+        for token in tokens:
+            if token.kind == LINK:
+                if token.closed:
+                    out.append(f":ref:`dict {token.text}`{token.suffix}")
+                else:
+                    out.append(f":ref:`dict {token.text}")
+            else:
+                out.append(token.text)
+        return "".join(out)
+    words: List[str] = []
+    for token in tokens:
+        if token.kind == TEXT:
+            words.extend(token.words or token.text.split())
+        elif token.kind == LINK:
+            linked = " ".join(token.words)
+            words.append(f":ref:`dict {linked.replace(']', '`')}")
+    return " ".join(words)
+
+
+def _rst_joined(text:str, diagnostics:list):
+    '''render_rst(iter_tokens(text, diagnostics)) straight from _scan(), without building any
+    tokens, because it is the hot path'''
+    out: List[str] = []
+    position = 0
+    for kind, start, end, _, words in _scan(text, _bracketed_words(text), diagnostics):
+        if start > position:
+            out.extend(text[position:start].split())
+        position = end
+        if kind == LINK:
+            out.append(":ref:`dict " + " ".join(words).replace("]", "`"))
+        elif kind == TEXT:
+            out.append(text[start:end])
+    if position < len(text):
+        out.extend(text[position:].split())
+    return " ".join(out)
+
+
+def rst_links(text:str, preserve_whitespace:bool = False, diagnostics:Optional[list] = None):
+    '''Return text as RST with every [link] turned into a :ref:.
+    If diagnostics is None, problems are reported as GlossLinkWarning warnings instead.'''
+    if "[" not in text and "]" not in text:
+        # nothing to link, so nothing can be malformed either
+        return text if preserve_whitespace else " ".join(text.split())
+    found: list = [] if diagnostics is None else diagnostics
+    if preserve_whitespace:
+        rst = render_rst(iter_tokens(text, found), preserve_whitespace=True)
+    else:
+        rst = _rst_joined(text, found)
+    if diagnostics is None:
+        for diagnostic in found:
+            warnings.warn(diagnostic.message, GlossLinkWarning, stacklevel=3)
+    return rst
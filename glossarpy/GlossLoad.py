@@ -0,0 +1,211 @@
+import concurrent.futures
+import csv
+import datetime
+import json
+import os
+import runpy
+from typing import Iterator, List, Optional
+from . import GlossEntry
+
+FIELDS = GlossEntry.FIELDS
+ALIASES = {"further_reading": "furtherreading"}  # spelling used in the readme
+SHARED_FIELDS = GlossEntry.SHARED_FIELDS
+
+
+class GlossLoadError(ValueError):
+    '''A record in a source file that can't be turned into a GlossEntry.
+    source - the file it came from
+    line - line number of the record (CSV and JSON Lines), or its position in the file (TOML)
+    message - what is wrong with it'''
+    def __init__(self, source:str, line:int, message:str):
+        super().__init__(f"{source}:{line}: {message}")
+        self.source: str = source
+        self.line: int = line
+        self.message: str = message
+
+    def __reduce__(self):
+        # so it survives being sent back from a process pool
+        return (GlossLoadError, (self.source, self.line, self.message))
+
+
+def entry_from_record(record, source:str = "<record>", line:int = 0, shared:Optional[dict] = None):
+    '''Validate a dict of field names to values and return it as a GlossEntry.
+    Raises GlossLoadError if a field is unknown, the name is missing or has brackets in it,
+    or a value has the wrong type. updated may be a datetime.date or a YYYY-MM-DD string.
+    If shared is a dict, repeated values of SHARED_FIELDS are stored in it and reused, which
+    has the same effect as GreatGloss.compact() but without the extra pass.'''
+    if not isinstance(record, dict):
+        raise GlossLoadError(source, line, f"expected a record of field names and values, got {type(record).__name__}")
+    fields = {}
+    for key, value in record.items():
+        field = ALIASES.get(key, key)
+        if field not in FIELDS:
+            raise GlossLoadError(source, line, f"unknown field {key!r}")
+        if value is None or value == "":
+            continue
+        if field == "updated":
+            value = _parse_date(value, source, line)
+        elif not isinstance(value, str):
+            raise GlossLoadError(source, line, f"{key} must be a string, got {type(value).__name__}")
+        if shared is not None and field in SHARED_FIELDS:
+            value = shared.setdefault(value, value)
+        fields[field] = value
+    name = fields.pop("name", "")
+    if not name.strip():
+        raise GlossLoadError(source, line, "missing name")
+    if "[" in name or "]" in name:
+        raise GlossLoadError(source, line, f"name {name!r} contains brackets")
+    return GlossEntry.GlossEntry(name, **fields)
+
+
+def _parse_date(value, source:str, line:int):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            pass
+    raise GlossLoadError(source, line, f"updated must be a YYYY-MM-DD date, got {value!r}")
+
+
+def _records_csv(path:str):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, f"more values than there are columns: {record[None]!r}"
+            else:
+                yield reader.line_num, record
+
+
+def _records_jsonl(path:str):
+    with open(path, "r", encoding="utf-8") as f:
+        for line, text in enumerate(f, start=1):
+            if not text.strip():
+                continue
+            try:
+                yield line, json.loads(text)
+            except ValueError as e:
+                yield line, f"invalid JSON: {e}"
+
+
+def _records_toml(path:str):
+    try:
+        import tomllib
+    except ImportError:  # Python < 3.11
+        try:
+            import tomli as tomllib  # type: ignore
+        except ImportError:
+            raise ImportError("Reading TOML needs Python 3.11 or newer, or the tomli package") from None
+    with open(path, "rb") as f:
+        try:
+            document = tomllib.load(f)
+        except tomllib.TOMLDecodeError as e:
+            yield 0, f"invalid TOML: {e}"
+            return
+    entries = document.get("entry", [])
+    if not isinstance(entries, list):
+        yield 0, "entries must be written as an [[entry]] array of tables"
+        return
+    for position, record in enumerate(entries, start=1):
+        yield position, record
+
+
+READERS = {
+    ".csv": _records_csv,
+    ".jsonl": _records_jsonl,
+    ".ndjson": _records_jsonl,
+    ".toml": _records_toml,
+}
+
+
+def _reader(path:str, kind:Optional[str]):
+    if kind is None:
+        kind = os.path.splitext(path)[1].lower()
+    elif not kind.startswith("."):
+        kind = "." + kind
+    try:
+        return READERS[kind]
+    except KeyError:
+        raise ValueError(f"Don't know how to read {kind!r} files ({path}), expected one of {sorted(READERS)}") from None
+
+
+def iter_located(path:str, kind:Optional[str] = None, errors:Optional[list] = None, shared:Optional[dict] = None):
+    '''Like iter_entries(), but yield (entry, line) pairs'''
+    for line, record in _reader(path, kind)(path):
+        try:
+            if isinstance(record, str):
+                raise GlossLoadError(path, line, record)
+            yield entry_from_record(record, path, line, shared), line
+        except GlossLoadError as e:
+            if errors is None:
+                raise
+            errors.append(e)
+
+
+def iter_entries(path:str, kind:Optional[str] = None, errors:Optional[list] = None,
+        shared:Optional[dict] = None) -> Iterator[GlossEntry.GlossEntry]:
+    '''Lazily yield a GlossEntry for each record in path, one record at a time (TOML files are
+    parsed whole, as TOML can't be read piecemeal). kind is "csv", "jsonl", or "toml", and is
+    guessed from the file extension if not given. If errors is a list, bad records are added to
+    it as GlossLoadError and skipped; otherwise the first one is raised.'''
+    for entry, _ in iter_located(path, kind, errors, shared):
+        yield entry
+
+
+def entries_from_python(path:str):
+    '''Run a Python file and return every GlossEntry it defines, in the order they were
+    defined, including the entries of any GreatGloss it defines'''
+    from . import GreatGloss  # GreatGloss imports this module
+    entries = []
+    seen: set = set()
+    for value in runpy.run_path(path, run_name="__glossarpy__").values():
+        if isinstance(value, GreatGloss.GreatGloss):
+            found = value.glosslist
+        elif isinstance(value, GlossEntry.GlossEntry):
+            found = [value]
+        else:
+            continue
+        for entry in found:
+            if id(entry) not in seen:
+                seen.add(id(entry))
+                entries.append(entry)
+    return entries
+
+
+def add_file(glossary, path:str, shared:Optional[dict] = None):
+    '''Add every entry in path to glossary (a GreatGloss). Python files are run, as in
+    entries_from_python(); anything else is read with iter_located(), and an entry the glossary
+    won't take is raised as a GlossLoadError pointing at its line.'''
+    if path.endswith(".py"):
+        glossary.add_entries(entries_from_python(path))
+        return
+    for entry, line in iter_located(path, shared=shared):
+        try:
+            glossary.add_entry(entry)
+        except ValueError as e:
+            raise GlossLoadError(path, line, str(e)) from None
+
+
+def load_located(paths:List[str], kind:Optional[str] = None, jobs:int = 1, errors:Optional[list] = None,
+        shared:Optional[dict] = None):
+    '''Read several files, up to jobs at a time, and yield (entry, path, line) in the order
+    the files were given, whatever order they finish reading in'''
+    def read(path):
+        found: list = []
+        located = [(entry, path, line) for entry, line in iter_located(path, kind, None if errors is None else found, shared)]
+        return located, found
+
+    if jobs <= 1 or len(paths) <= 1:
+        for path in paths:
+            for entry, line in iter_located(path, kind, errors, shared):
+                yield entry, path, line
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as pool:
+        for located, found in pool.map(read, paths):
+            if errors is not None:
+                errors.extend(found)
+            yield from located
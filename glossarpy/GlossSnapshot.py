@@ -0,0 +1,156 @@
+import datetime
+import mmap
+import struct
+from . import GlossCache
+from . import GlossEntry
+from . import GlossFormat
+
+MAGIC = b"GLOSNAP\0"
+SNAPSHOT_VERSION = 1  # bump whenever the layout below changes
+FIELDS = GlossEntry.TEXT_FIELDS
+
+# Layout, all little-endian:
+#   header - magic, version, entry count, where the records, index and string table start,
+#            the glossary's title (as a string reference) and when it was updated
+#   records - one fixed-size record per entry, in glossary order: a string reference for each
+#            of FIELDS, then when the entry was updated
+#   index - record numbers, sorted by the entry's name as UTF-8 bytes
+#   string table - every distinct string once, as UTF-8, one after the other
+# A string reference is (offset into the string table, length in bytes). Dates are ordinals.
+_HEADER = struct.Struct("<8sIIQQQQII")
+_RECORD = struct.Struct("<" + "QI" * len(FIELDS) + "I")
+_NAME = struct.Struct("<QI")  # just the start of a record
+_NUMBER = struct.Struct("<I")
+
+
+def _encode(text):
+    if not isinstance(text, str):
+        text = "" if text is None else str(text)
+    return text.encode("utf-8", "surrogatepass")
+
+
+def write(glossary, path:str):
+    '''Atomically write glossary (a GreatGloss) to path as a snapshot'''
+    strings = bytearray()
+    refs: dict = {}  # encoded string -> (offset, length), so repeated values are stored once
+
+    def ref(data:bytes):
+        found = refs.get(data)
+        if found is None:
+            found = refs[data] = (len(strings), len(data))
+            strings.extend(data)
+        return found
+
+    records = bytearray()
+    names = []
+    for number, entry in enumerate(glossary.glosslist):
+        fields = []
+        for field in FIELDS:
+            fields.extend(ref(_encode(getattr(entry, field))))
+        records += _RECORD.pack(*fields, entry.updated.toordinal())
+        names.append((_encode(entry.name), number))
+    names.sort()
+    index = b"".join([_NUMBER.pack(number) for _, number in names])
+    title = ref(_encode(glossary.title))
+
+    start = _HEADER.size
+    header = _HEADER.pack(MAGIC, SNAPSHOT_VERSION, len(names), start, start + len(records),
+        start + len(records) + len(index), title[0], title[1], glossary.updated.toordinal())
+    GlossCache.write_atomic(path, [header, records, index, strings])
+
+
+class GlossSnapshot:
+    '''A glossary saved with GreatGloss.save_snapshot(), opened read-only without loading it.
+    The file is memory-mapped, so opening it costs the same whatever its size, and looking an
+    entry up by name only decodes that one entry. Iterating over it decodes entries one at a
+    time, in the order they were in the glossary. Use to_glossary() for a full GreatGloss.'''
+    def __init__(self, path:str):
+        self.path: str = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is not a glossarpy snapshot")
+        (magic, version, self._count, self._records, self._index, self._strings,
+            title_offset, title_length, updated) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a glossarpy snapshot")
+        if version != SNAPSHOT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is a version {version} snapshot, but this glossarpy reads version {SNAPSHOT_VERSION}")
+        self.title: str = self._string(title_offset, title_length)
+        self.updated: datetime.date = datetime.date.fromordinal(updated)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for number in range(self._count):
+            yield self._entry(number)
+
+    def __contains__(self, name):
+        return self._find(name) is not None
+
+    def _string(self, offset:int, length:int):
+        start = self._strings + offset
+        return self._map[start:start + length].decode("utf-8", "surrogatepass")
+
+    def _entry(self, number:int):
+        values = _RECORD.unpack_from(self._map, self._records + number * _RECORD.size)
+        fields = {field: self._string(values[2 * i], values[2 * i + 1]) for i, field in enumerate(FIELDS)}
+        return GlossEntry.GlossEntry(updated=datetime.date.fromordinal(values[-1]), **fields)
+
+    def _name_bytes(self, number:int):
+        offset, length = _NAME.unpack_from(self._map, self._records + number * _RECORD.size)
+        start = self._strings + offset
+        return self._map[start:start + length]
+
+    def _find(self, name:str):
+        '''Return the record number of the entry called name, or None, by binary search of the index'''
+        target = _encode(name)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            number = _NUMBER.unpack_from(self._map, self._index + middle * _NUMBER.size)[0]
+            found = self._name_bytes(number)
+            if found < target:
+                low = middle + 1
+            elif found > target:
+                high = middle
+            else:
+                return number
+        return None
+
+    def names(self):
+        '''Yield the name of every entry, sorted by code point'''
+        for i in range(self._count):
+            number = _NUMBER.unpack_from(self._map, self._index + i * _NUMBER.size)[0]
+            yield self._name_bytes(number).decode("utf-8", "surrogatepass")
+
+    def get_entry(self, name:str):
+        '''Return the entry called name as a GlossEntry, or raise a KeyError if there isn't one'''
+        number = self._find(name)
+        if number is None:
+            raise KeyError(name)
+        return self._entry(number)
+
+    def render_entry(self, name:str, format:str = "rst", timestamp:bool = False):
+        '''Render the entry called name in format (see GlossFormat)'''
+        return GlossFormat.get_format(format).render(self.get_entry(name), timestamp)
+
+    def to_glossary(self, **kwargs):
+        '''Decode every entry into a new GreatGloss. Keyword arguments are passed to GreatGloss().'''
+        from . import GreatGloss  # GreatGloss imports this module
+        glossary = GreatGloss.GreatGloss(self.title, updated=self.updated, **kwargs)
+        glossary.add_entries(list(self))
+        return glossary
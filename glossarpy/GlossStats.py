@@ -0,0 +1,85 @@
+import contextlib
+import json
+import time
+
+
+class GlossStats:
+    '''Collects how long each stage of a glossary build took, plus counters such as entries
+    rendered, links resolved, and bytes written. Pass one as stats= to GreatGloss methods like
+    write_glossary() and write_toc(); the same object can be passed to several calls to add up
+    a whole build. If hook is given, it is called as hook(stage, seconds) whenever a stage ends.'''
+    enabled = True
+
+    def __init__(self, hook=None):
+        self.hook = hook
+        self.durations: dict = {}  # stage -> total seconds
+        self.counters: dict = {}  # counter -> total
+
+    @contextlib.contextmanager
+    def stage(self, name:str):
+        '''Time the body of a with block as stage name'''
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name:str, seconds:float):
+        '''Add seconds to stage name'''
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        if self.hook is not None:
+            self.hook(name, seconds)
+
+    def count(self, name:str, amount:int = 1):
+        '''Add amount to counter name'''
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timed(self, name:str, iterable):
+        '''Yield from iterable, counting only the time spent producing each item as stage name.
+        Time spent by whoever consumes the items (such as writing them to disk) isn't included.'''
+        iterator = iter(iterable)
+        seconds = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    seconds += time.perf_counter() - start
+                    return
+                seconds += time.perf_counter() - start
+                yield item
+        finally:
+            self.add_time(name, seconds)
+
+    def as_dict(self):
+        '''Return everything recorded as {"stages": {stage: seconds}, "counters": {counter: total}}'''
+        return {"stages": dict(self.durations), "counters": dict(self.counters)}
+
+    def to_json(self, **kwargs):
+        '''Return as_dict() as a JSON string. Keyword arguments are passed to json.dumps().'''
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def __repr__(self):
+        return f"GlossStats({self.as_dict()!r})"
+
+
+class NullStats(GlossStats):
+    '''A GlossStats that records nothing, for when nobody asked for stats'''
+    enabled = False
+
+    @contextlib.contextmanager
+    def stage(self, name:str):
+        yield self
+
+    def add_time(self, name:str, seconds:float):
+        pass
+
+    def count(self, name:str, amount:int = 1):
+        pass
+
+    def timed(self, name:str, iterable):
+        return iterable
+
+
+NULL_STATS = NullStats()
@@ -1,8 +1,11 @@
-import re
+import warnings
+from typing import Optional
+from . import GlossLink
 
 
 class GlossTxt:
     '''Handles RST-specific output'''
+    __slots__ = ()  # keeps GlossEntry's __slots__ effective
 
     def underline_text(self, text:str, underlinechar:str = "-"):
         '''Underlines text, used to create a valid rst header or make txt prettier'''
@@ -21,45 +24,19 @@ class GlossTxt:
         '''Generates an RST bookmark for the entry'''
         return f".. _dict {self.return_name(nospaces=False)}:"
 
+    def rst_process_links(self, text:str, preserve_whitespace:bool = False, diagnostics:Optional[list] = None):
+        '''Turn every [this] in text into an RST internal link, assuming the part being linked to
+        has a bookmark created with rst_bookmark(). Words are rejoined with single spaces unless
+        preserve_whitespace is True. Problems are appended to diagnostics as GlossLink.LinkDiagnostic
+        objects if it is a list, otherwise they are raised as GlossLink.GlossLinkWarning warnings.'''
+        return GlossLink.rst_links(text, preserve_whitespace=preserve_whitespace, diagnostics=diagnostics)
+
     def rst_process_brackets(self, words:list):
         '''Turn [this] into an RST internal link, assuming the part being linked to
         has a bookmark created with rst_bookmark(). Expects words to be a list of
-        strings, split upon spaces.'''
-        words_processed = []
-        multi_word_flag = False
-        for word in words:
-            if re.search("][a-zA-Z]+", word):
-                print(f"""Warning: An entry will have an invalid internal link
-                    due RST limitations. Put some sort of whitespace or punctuation before
-                    any additional letters after the ending bracket. Problematic word: {word}""")
-
-            # This is the beginning of an internal RST link
-            elif word.startswith("["):
-                word = word[1:]  # strip [
-                if "]" in word:
-                    multi_word_flag = False
-                    word = word.replace("]", "`")
-                    word = f":ref:`dict {word}"
-                else:
-                    multi_word_flag = True
-                    word = f":ref:`dict {word}"
-
-                words_processed.append(word)
-
-            # This is a continuation of a previous word's RST link
-            # will break on [Seven Br]idges] but that's not my problem
-            elif multi_word_flag is True:
-
-                if "]" in word:
-                    multi_word_flag = False
-                    word = word.replace("]", "`")
-                    word = f"{word}"
-                else:
-                    word = f"{word}"
-
-                words_processed.append(word)
-
-            else:
-                words_processed.append(word)
-
-        return " ".join(words_processed)
+        strings, split upon spaces. Prefer rst_process_links(), which takes the text as-is.'''
+        found: list = []
+        rst = GlossLink.render_rst(GlossLink.iter_word_tokens(words, found))
+        for diagnostic in found:
+            warnings.warn(diagnostic.message, GlossLink.GlossLinkWarning, stacklevel=2)
+        return rst
@@ -0,0 +1,396 @@
+import json
+import os
+import sys
+import time
+from . import GlossCache
+from . import GlossCLI
+from . import GlossEntry
+from . import GlossFormat
+from . import GlossLoad
+from . import GreatGloss
+
+
+def _same(first, second):
+    return all(getattr(first, field) == getattr(second, field) for field in GlossEntry.FIELDS)
+
+
+def _common_prefix(first:bytes, second:bytes, chunksize:int = 1 << 16):
+    '''Return how many bytes first and second have in common at the start'''
+    limit = min(len(first), len(second))
+    low = 0
+    while low < limit and first[low:low + chunksize] == second[low:low + chunksize]:
+        low += chunksize
+    high = min(low + chunksize, limit)
+    while low < high:  # they match up to low, and differ somewhere before high
+        middle = (low + high + 1) // 2
+        if first[low:middle] == second[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return min(low, limit)
+
+
+def _common_suffix(first:bytes, second:bytes, limit:int, chunksize:int = 1 << 16):
+    '''Return how many bytes (up to limit) first and second have in common at the end'''
+    first_end, second_end = len(first), len(second)
+    low = 0
+    while low < limit:
+        size = min(chunksize, limit - low)
+        if first[first_end - low - size:first_end - low] != second[second_end - low - size:second_end - low]:
+            break
+        low += size
+    high = min(low + chunksize, limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[first_end - middle:first_end - low] == second[second_end - middle:second_end - low]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _line_count(data:bytes):
+    return data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+
+
+def _forget_modules(paths:list):
+    '''Drop any module imported from one of paths, so running a source again imports it afresh'''
+    paths = {os.path.realpath(path) for path in paths}
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None)
+        if filename and os.path.realpath(filename) in paths:
+            del sys.modules[name]
+
+
+class SourceReader:
+    '''One source file of a glossary being watched, with found, {name: entry} for everything in
+    it as of the last read(). changed() only looks at the file's size and modification time.
+    JSON Lines files are compared with what was there last time, and only the lines in between
+    the parts that stayed the same are parsed again, so an edit to one line of a huge file costs
+    little more than reading it. Other kinds of file are parsed in full.'''
+    def __init__(self, path:str, duplicates:str = "error"):
+        self.path: str = path
+        self.duplicates: str = duplicates
+        self.stamp = None
+        self.found: dict = {}
+        self._data: bytes = None  # JSON Lines files: the file as last read...
+        self._line_entries: list = []  # ...the entry on each of its lines, or None...
+        self._counts: dict = {}  # ...and how many lines each name is on
+
+    def changed(self):
+        return GlossCLI.file_stamp(self.path) != self.stamp
+
+    def read(self, errors:list):
+        '''Read the file again, adding problems to errors, and return the names of the entries
+        that may have been added, removed or changed since the last read'''
+        self.stamp = GlossCLI.file_stamp(self.path)
+        if os.path.splitext(self.path)[1].lower() in (".jsonl", ".ndjson"):
+            return self._read_jsonl(errors)
+        if self.path.endswith(".py"):
+            located = ((entry, 0) for entry in GlossLoad.entries_from_python(self.path))
+        else:
+            located = GlossLoad.iter_located(self.path, errors=errors)
+        old = self.found
+        self.found = self._collect(located, errors)
+        return set(old) | set(self.found)
+
+    def names(self):
+        '''The names of the entries in the file, in the order they first appear'''
+        if self._data is None:
+            return list(self.found)
+        return list(dict.fromkeys(entry.name for entry in self._line_entries if entry is not None))
+
+    def _collect(self, located, errors:list):
+        '''Return {name: entry} for (entry, line number) pairs, dealing with duplicate names'''
+        entries: dict = {}
+        for entry, line in located:
+            if entry.name in entries and self.duplicates != "last":
+                if self.duplicates == "error":
+                    errors.append(GlossLoad.GlossLoadError(self.path, line, f"more than one entry is named {entry.name!r}"))
+                continue
+            entries[entry.name] = entry
+        return entries
+
+    def _read_jsonl(self, errors:list):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        old = self._data if self._data is not None else b""
+        # the lines that changed are the ones between what the old and new file start and end with,
+        # widened to whole lines in both: the common suffix can start part way through a line, or
+        # take the newline of a line that is only whole in one of them
+        start = old.rfind(b"\n", 0, _common_prefix(old, data)) + 1
+        suffix = _common_suffix(old, data, min(len(old), len(data)) - start)
+        old_end, new_end = len(old) - suffix, len(data) - suffix
+        if old[old_end - 1:old_end] not in (b"", b"\n") or data[new_end - 1:new_end] not in (b"", b"\n"):
+            newline = old.find(b"\n", old_end)
+            suffix = 0 if newline == -1 else len(old) - newline - 1
+            old_end, new_end = len(old) - suffix, len(data) - suffix
+        first = old.count(b"\n", 0, start)
+
+        added = []
+        for number, record in enumerate(data[start:new_end].split(b"\n")[:_line_count(data[start:new_end])], start=first + 1):
+            entry = None
+            if record.strip():
+                try:
+                    entry = GlossLoad.entry_from_record(json.loads(record.decode("utf-8")), self.path, number)
+                except GlossLoad.GlossLoadError as e:
+                    errors.append(e)
+                except ValueError as e:
+                    errors.append(GlossLoad.GlossLoadError(self.path, number, f"invalid JSON: {e}"))
+            added.append(entry)
+        removed = self._line_entries[first:first + _line_count(old[start:old_end])]
+        self._line_entries[first:first + len(removed)] = added
+        self._data = data
+
+        counts = self._counts
+        before: dict = {}  # name -> how many lines it was on
+        for entries, step in ((removed, -1), (added, 1)):
+            for entry in entries:
+                if entry is not None:
+                    before.setdefault(entry.name, counts.get(entry.name, 0))
+                    counts[entry.name] = counts.get(entry.name, 0) + step
+        for name in before:
+            if not counts[name]:
+                del counts[name]
+                self.found.pop(name, None)
+        if any(count > 1 or counts.get(name, 0) > 1 for name, count in before.items()):
+            # rare enough to just start again, so that the right one of the duplicates wins
+            self.found = self._collect(((entry, number) for number, entry in enumerate(self._line_entries, start=1)
+                if entry is not None), errors)
+        else:
+            for entry in added:
+                if entry is not None:
+                    self.found[entry.name] = entry
+        return set(before)
+
+
+class GlossWatcher:
+    '''Keeps one glossary from a glossarpy build config (see GlossCLI.load_config()) in memory,
+    along with every entry's rendered output. poll() checks whether any source changed, and if
+    so, works out which entries were added, removed or changed, re-renders only those and the
+    entries that link to them, and replaces the outputs. A change to one of the glossary's
+    depends runs every Python source again.'''
+    def __init__(self, settings:dict, report=None):
+        self.settings: dict = settings
+        self.report = report if report is not None else (lambda message: print(message, file=sys.stderr))
+        self.renderer = GlossFormat.get_format(settings["format"])
+        self.toc_renderer = GlossFormat.get_format(settings["tocFormat"]) if settings["toc"] else None
+        self.sources = [SourceReader(path, settings["duplicates"]) for path in settings["sources"]]
+        self.depends: dict = {path: None for path in settings["depends"]}  # path -> its stamp when last checked
+        self.glossary: GreatGloss.GreatGloss = None
+        self._rendered: dict = {}  # name -> rendered entry
+        self._toc_lines: dict = {}  # name -> the entry's line in the glossary's own TOC
+        self._toc_file_lines: dict = {}  # name -> the entry's line in the separate TOC file
+        # so a poll only has to look up the entries themselves, these are kept until entries
+        # are added or removed, or a TOC line changes
+        self._order: list = None  # every entry's name, in glossary order
+        self._toc_text: str = None  # the glossary's own TOC lines, joined
+        self._toc_file_text: str = None  # the separate TOC file's lines, joined
+
+    def start(self):
+        '''Read every source, render every entry and write the outputs'''
+        settings = self.settings
+        self.glossary = GreatGloss.GreatGloss(settings["title"], duplicates=settings["duplicates"],
+            collation=settings["collation"] or None)
+        errors: list = []
+        self.depends = {path: GlossCLI.file_stamp(path) for path in self.depends}
+        for source in self.sources:
+            source.read(errors)
+            for entry in source.found.values():
+                self._add(entry, errors)
+        self.glossary.link_graph()
+        for entry in self.glossary.glosslist:
+            self._render(entry)
+        self._report(errors, self._names())
+        self.write(compare=True)
+
+    def poll(self):
+        '''If any source has changed, bring the outputs up to date. Returns the number of
+        entries that were re-rendered, or None if nothing changed.'''
+        changed = [source for source in self.sources if source.changed()]
+        depends = {path: GlossCLI.file_stamp(path) for path in self.depends}
+        if depends != self.depends:
+            _forget_modules([path for path in depends if depends[path] != self.depends[path]])
+            self.depends = depends
+            changed.extend(source for source in self.sources if source.path.endswith(".py") and source not in changed)
+        if not changed:
+            return None
+        errors: list = []
+        touched = []
+        for source in changed:
+            try:
+                touched.append(source.read(errors))
+            except OSError as e:  # such as an editor replacing the file; it'll be read once it's back
+                errors.append(e)
+        glossary = self.glossary
+        affected: set = set()
+        for name in dict.fromkeys(name for names in touched for name in names):
+            entry = self._winner(name, errors)
+            current = self._current(name)
+            if current is entry or (current is not None and entry is not None and _same(current, entry)):
+                continue
+            if entry is None:
+                glossary.remove_entry(name)
+                self._order = self._toc_text = self._toc_file_text = None
+            elif current is None:
+                glossary.add_entry(entry)
+                self._order = None
+            else:
+                glossary.replace_entry(name, entry)
+            affected.add(name)
+        reordered = not self.settings["collation"] and self._load_order()
+        if not affected and not reordered and not errors:
+            return 0
+        graph = glossary.link_graph()
+        linking = {source for name in affected for source in graph.backlinks(name)}
+        rerender = [glossary.get_entry(name) for name in affected | linking if name in glossary]
+        for name in affected:
+            if name not in glossary:
+                self._rendered.pop(name, None)
+                self._toc_lines.pop(name, None)
+                self._toc_file_lines.pop(name, None)
+        for entry in rerender:
+            self._render(entry)
+        self._report(errors, [entry.name for entry in rerender])
+        if affected or reordered:
+            self.write()
+        return len(rerender)
+
+    def _names(self):
+        return [entry.name for entry in self.glossary.glosslist]
+
+    def _current(self, name:str):
+        '''Return the entry called name in the glossary, or None'''
+        return self.glossary.get_entry(name) if name in self.glossary else None
+
+    def _add(self, entry, errors:list):
+        try:
+            self.glossary.add_entry(entry)
+        except ValueError as e:
+            errors.append(e)
+
+    def _winner(self, name:str, errors:list):
+        '''Return the entry called name that a fresh build would keep, or None if no source has
+        one. As in a build, that depends on the order of the sources, not on which was edited last.'''
+        found = [source.found[name] for source in self.sources if name in source.found]
+        if not found:
+            return None
+        if len(found) > 1 and self.settings["duplicates"] == "error":
+            errors.append(ValueError(f"Glossary {self.glossary.title!r} already has an entry named {name!r}"))
+        return found[-1] if self.settings["duplicates"] == "last" else found[0]
+
+    def _load_order(self):
+        '''Put an unsorted glossary's entries back in the order a build would have loaded them.
+        Returns True if that moved any.'''
+        glossary = self.glossary
+        names = list(dict.fromkeys(name for source in self.sources for name in source.names()))
+        if names == self._names():
+            return False
+        glossary.glosslist[:] = [glossary.get_entry(name) for name in names]
+        glossary.reindex()
+        self._order = self._toc_text = self._toc_file_text = None
+        return True
+
+    def _render(self, entry):
+        settings = self.settings
+        self._rendered[entry.name] = self.renderer.render(entry, settings["timestamp"])
+        if not settings["skipTOC"]:
+            line = self.renderer.toc_line(entry)
+            if self._toc_lines.get(entry.name) != line:
+                self._toc_lines[entry.name] = line
+                self._toc_text = None
+        if self.toc_renderer is not None:
+            line = self.toc_renderer.toc_line(entry)
+            if self._toc_file_lines.get(entry.name) != line:
+                self._toc_file_lines[entry.name] = line
+                self._toc_file_text = None
+
+    def _report(self, errors:list, names:list):
+        '''Report load errors, plus link problems in the entries called names'''
+        output = self.settings["output"]
+        for error in errors:
+            self.report(f"{output}: {error}")
+        glossary = self.glossary
+        graph = glossary.link_graph()
+        for name in names:
+            for diagnostic in glossary.get_entry(name).check_links():
+                self.report(f"{output}: {name}: {diagnostic}")
+            for target in graph.links(name):
+                if target not in glossary:
+                    self.report(f"{output}: {name}: links to {target!r}, which isn't in the glossary")
+
+    def _in_order(self, cache:dict):
+        '''cache's value for every entry, in glossary order'''
+        if self._order is None:
+            self._order = [entry.name for entry in self.glossary.glosslist]
+        return map(cache.__getitem__, self._order)
+
+    def _fragments(self):
+        '''The whole glossary, as write_glossary() would write it, from already rendered entries'''
+        settings = self.settings
+        renderer = self.renderer
+        fragments = [renderer.start(settings["title"])]
+        if not settings["skipSource"]:
+            fragments.append(self.glossary.add_source(format=settings["format"], sourcefile=settings["sourcefile"]))
+        fragments.extend(renderer.title(settings["title"]))
+        if not settings["skipTOC"]:
+            fragments.append(renderer.toc_start(settings["columns"]))
+            if self._toc_text is None:
+                self._toc_text = "".join(self._in_order(self._toc_lines))
+            fragments.append(self._toc_text)
+            fragments.append(renderer.toc_finish())
+            fragments.append(renderer.toc_end())
+        fragments.extend(self._in_order(self._rendered))
+        fragments.append(renderer.end())
+        return fragments
+
+    def _toc_fragments(self):
+        '''The separate TOC file, as write_toc() would write it'''
+        settings = self.settings
+        fragments = []
+        if not settings["skipSource"]:
+            fragments.append(self.glossary.add_source(format=settings["tocFormat"], sourcefile=settings["sourcefile"]))
+        fragments.append(self.toc_renderer.toc_start(settings["tocColumns"]))
+        if self._toc_file_text is None:
+            self._toc_file_text = "".join(self._in_order(self._toc_file_lines))
+        fragments.append(self._toc_file_text)
+        fragments.append(self.toc_renderer.toc_finish())
+        return fragments
+
+    def write(self, compare:bool = False):
+        '''Atomically replace the outputs. If compare, only replace those whose contents changed,
+        which costs reading them back. Returns the paths written.'''
+        written = []
+        outputs = [(self.settings["output"], self._fragments)]
+        if self.toc_renderer is not None and (compare or self._toc_file_text is None):
+            outputs.append((self.settings["toc"], self._toc_fragments))
+        for path, fragments in outputs:
+            # one big write, rather than one per entry
+            text = "".join(fragments())
+            if compare:
+                if GlossCache.write_if_changed(path, [text], lambda stream, text: stream.write(text[0])):
+                    written.append(path)
+                continue
+            GlossCache.write_atomic(path, text)
+            written.append(path)
+        return written
+
+
+def watch(builds:list, interval:float = 0.05, report=None, log=None):
+    '''Build every glossary in builds (see GlossCLI.load_config()), then poll their sources every
+    interval seconds and update the outputs when they change, until interrupted'''
+    log = log if log is not None else print
+    watchers = []
+    for settings in builds:
+        watcher = GlossWatcher(settings, report)
+        start = time.perf_counter()
+        watcher.start()
+        log(f"{settings['output']}: {len(watcher.glossary)} entries written in {time.perf_counter() - start:.2f} s, watching for changes")
+        watchers.append(watcher)
+    while True:
+        for watcher in watchers:
+            start = time.perf_counter()
+            rerendered = watcher.poll()
+            if rerendered is not None:
+                log(f"{watcher.settings['output']}: {rerendered} entries re-rendered in {(time.perf_counter() - start) * 1000:.0f} ms")
+        time.sleep(interval)
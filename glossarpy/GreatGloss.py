@@ -1,36 +1,461 @@
+import bisect
+import collections
+import concurrent.futures
 import datetime
+import operator
+import os
+import re
+import time
+from . import GlossCache
+from . import GlossCollate
+from . import GlossFormat
+from . import GlossGraph
 from . import GlossTxt
 from . import GlossEntry
+from . import GlossLink
+from . import GlossLoad
+from . import GlossSnapshot
+from . import GlossStats
+
+DEFAULT_BUFFER_SIZE = 1 << 16  # characters held before each write() call
+DUPLICATE_POLICIES = ("error", "first", "last")
+SHARD_BY = ("letter", None)  # or any function that takes an entry and returns the name of its shard
+SHARED_FIELDS = GlossEntry.SHARED_FIELDS
+PARALLEL_MIN_ENTRIES = 2000  # below this, starting workers costs more than it saves
+PARALLEL_MAX_CHUNK = 2048
+BULK_INSERT = 64  # add_entries() with more entries than this re-sorts once instead of inserting one by one
+_ENTRY_VALUES = operator.attrgetter("name", *GlossFormat.FIELDS, "updated")  # everything an entry renders from
+
+
+def _write_buffered(stream, fragments, buffersize:int = DEFAULT_BUFFER_SIZE, stats:GlossStats.GlossStats = None):
+    '''Join fragments into chunks of about buffersize characters and write each chunk to stream.
+    Returns the number of characters written.'''
+    if stats is not None and stats.enabled:
+        return _write_buffered_counted(stream, fragments, buffersize, stats)
+    pending = []
+    pending_size = 0
+    written = 0
+    for fragment in fragments:
+        pending.append(fragment)
+        pending_size += len(fragment)
+        if pending_size >= buffersize:
+            stream.write("".join(pending))
+            written += pending_size
+            pending = []
+            pending_size = 0
+    if pending:
+        stream.write("".join(pending))
+        written += pending_size
+    return written
+
+
+def _write_buffered_counted(stream, fragments, buffersize:int, stats:GlossStats.GlossStats):
+    '''_write_buffered(), but timing the writes and counting what is written'''
+    encoding = getattr(stream, "encoding", None)  # None for in-memory streams like io.StringIO
+    seconds = 0.0
+    written = 0
+    written_bytes = 0
+
+    def write(chunk):
+        nonlocal seconds, written, written_bytes
+        start = time.perf_counter()
+        stream.write(chunk)
+        seconds += time.perf_counter() - start
+        written += len(chunk)
+        if encoding:
+            written_bytes += len(chunk.encode(encoding, errors="replace"))
+
+    pending = []
+    pending_size = 0
+    for fragment in fragments:
+        pending.append(fragment)
+        pending_size += len(fragment)
+        if pending_size >= buffersize:
+            write("".join(pending))
+            pending = []
+            pending_size = 0
+    if pending:
+        write("".join(pending))
+    stats.add_time("write", seconds)
+    stats.count("characters_written", written)
+    if encoding:
+        stats.count("bytes_written", written_bytes)
+    return written
+
+
+def _shard_letter(entry:GlossEntry):
+    '''Shard key for by="letter": the entry's first letter, or # if it doesn't start with one'''
+    first = entry.name[:1]
+    return first.upper() if first.isalpha() else "#"
+
+
+def _slug(label:str):
+    '''Turn a shard's label into something safe to use in a filename'''
+    slug = re.sub(r"[^\w]+", "-", label).strip("-")
+    return slug if slug else "symbols"
+
+
+def _render_chunk(entries:list, format:str, timestamp:bool):
+    '''Render a list of entries. Lives at module level so process pools can pickle it.'''
+    return [entry.generate(format=format, timestamp=timestamp) for entry in entries]
+
+
+def _chunk_size(entries:int, workers:int):
+    '''Aim for about eight chunks per worker, so the pool stays busy without every entry paying
+    its own round trip, but keep chunks small enough that output can start streaming early'''
+    return max(64, min(PARALLEL_MAX_CHUNK, entries // (workers * 8)))
+
+
+def _render_parallel(entries:list, format:str, timestamp:bool, workers:int, executor, cache, kept:dict = None,
+        rendered:list = None):
+    '''Yield rendered entries in order, rendering them in chunks on executor ("process",
+    "thread", or a concurrent.futures.Executor). Only a few chunks per worker are in flight at
+    once, so output streams out as it is ready. With a cache, or entries kept from an earlier
+    render (see GreatGloss.keep_rendered), only misses go to the pool, and are added to rendered
+    if it is a list.'''
+    if executor == "process":
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    elif executor == "thread":
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    elif isinstance(executor, concurrent.futures.Executor):
+        pool = executor
+    else:
+        raise ValueError(f"executor must be 'process', 'thread', or a concurrent.futures.Executor, not {executor!r}")
+    size = _chunk_size(len(entries), workers)
+    in_flight: collections.deque = collections.deque()
+    try:
+        for start in range(0, len(entries), size):
+            chunk = entries[start:start + size]
+            values = None if kept is None else [_ENTRY_VALUES(entry) for entry in chunk]
+            fragments = [None] * len(chunk) if kept is None else [_kept_fragment(kept, value) for value in values]
+            keys = None
+            if cache is not None:
+                keys = [cache.key(entry, format, timestamp) for entry in chunk]
+                for key, fragment in zip(keys, fragments):
+                    if fragment is not None:
+                        cache.store(key, fragment)  # so saving the cache keeps what was kept
+                fragments = [cache.lookup(key) if fragment is None else fragment for key, fragment in zip(keys, fragments)]
+            misses = [entry for entry, fragment in zip(chunk, fragments) if fragment is None]
+            future = pool.submit(_render_chunk, misses, format, timestamp) if misses else None
+            if rendered is not None:
+                rendered.extend(misses)
+            in_flight.append((keys, values, fragments, future))
+            if len(in_flight) >= workers * 2:
+                yield from _collect_chunk(in_flight.popleft(), cache, kept)
+        while in_flight:
+            yield from _collect_chunk(in_flight.popleft(), cache, kept)
+    finally:
+        for _, _, _, future in in_flight:
+            if future is not None:
+                future.cancel()
+        if pool is not executor:
+            pool.shutdown()
+
+
+def _collect_chunk(chunk, cache, kept:dict = None):
+    keys, values, fragments, future = chunk
+    if future is not None:
+        rendered = iter(future.result())
+        for i, fragment in enumerate(fragments):
+            if fragment is None:
+                fragments[i] = next(rendered)
+                if cache is not None:
+                    cache.store(keys[i], fragments[i])
+    if kept is not None:
+        for value, fragment in zip(values, fragments):
+            kept[value[0]] = (value, fragment)
+    return fragments
+
+
+def _kept_fragment(kept:dict, values:tuple):
+    '''Return what the entry with these values rendered to last time, or None if it has changed'''
+    found = kept.get(values[0])
+    if found is not None and found[0] == values:
+        return found[1]
+    return None
 
 
 class GreatGloss(GlossTxt.GlossTxt):
     '''Object for an entire glossary'''
-    def __init__(self, title, outfile="", outtoc="", updated=datetime.date.today()):
+    def __init__(self, title, outfile="", outtoc="", updated=None, duplicates:str = "error", collation=None,
+            keep_rendered:bool = False):
+        '''
+        duplicates - what add_entry() does with an entry whose name is already in the glossary:
+            "error" raises a ValueError, "first" keeps the entry already there,
+            "last" replaces the entry already there with the new one
+        collation - if set, keep entries sorted as they are added, in this order (see GlossCollate):
+            "upper", "casefold", "natural", "nopunct", "exact", or a function of an entry's name
+        keep_rendered - keep what each entry renders to in memory, so rendering the glossary again
+            only renders entries that were added or changed since (see forget_rendered())
+        '''
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f"duplicates must be one of {DUPLICATE_POLICIES}, not {duplicates!r}")
         self.title: str = title
         self.outfile: str = outfile
         self.outtoc: str = outtoc
-        self.updated: datetime = updated
+        self.updated: datetime = updated if updated is not None else datetime.date.today()
+        self.duplicates: str = duplicates
         self.glosslist: list[GlossEntry] = []  # updated by add_entry
+        self._names: dict = {}  # name -> entry
+        self._casefolded: dict = {}  # name.casefold() -> list of entries, in the order they were added
+        self._positions: dict = {}  # name -> index in glosslist, rebuilt lazily after anything reorders glosslist
+        self.load_errors: list = []  # filled in by from_files() with errors="collect"
+        self.parent: GreatGloss = None  # set by shard() to the glossary a shard was split from
+        self.collation = None
+        self._collate = None
+        self._sortkeys: list = None  # collation key of each entry in glosslist, if keeping it sorted
+        self._deferring: bool = False  # True while add_entries() appends first and sorts after
+        self._graph: GlossGraph.GlossGraph = None  # built by link_graph(), then kept up to date
+        self.keep_rendered: bool = keep_rendered
+        self._rendered: dict = {}  # (renderer, timestamp) -> {name: (entry's fields, rendered entry)}
+        if collation is not None:
+            self.set_collation(collation)
+
+    @classmethod
+    def from_files(cls, paths, title:str, kind:str = None, errors:str = "raise", jobs:int = 1, **kwargs):
+        '''Build a glossary from one or more CSV, JSON Lines, or TOML files (see GlossLoad).
+        Records are streamed in, checked, and added in the order they appear, file by file.
+        kind - "csv", "jsonl", or "toml"; guessed from each file's extension if not given
+        errors - "raise" stops at the first bad record with a GlossLoad.GlossLoadError;
+            "collect" skips bad records and lists them in the glossary's load_errors
+        jobs - how many files to read at the same time
+        Any other keyword arguments are passed to GreatGloss().'''
+        if errors not in ("raise", "collect"):
+            raise ValueError(f"errors must be 'raise' or 'collect', not {errors!r}")
+        if isinstance(paths, (str, os.PathLike)):
+            paths = [paths]
+        glossary = cls(title, **kwargs)
+        found = [] if errors == "collect" else None
+        for entry, path, line in GlossLoad.load_located([os.fspath(path) for path in paths], kind, jobs, found, shared={}):
+            try:
+                glossary.add_entry(entry)
+            except ValueError as e:
+                if found is None:
+                    raise GlossLoad.GlossLoadError(path, line, str(e)) from None
+                found.append(GlossLoad.GlossLoadError(path, line, str(e)))
+        glossary.load_errors = found or []
+        return glossary
+
+    @classmethod
+    def from_csv(cls, paths, title:str, errors:str = "raise", jobs:int = 1, **kwargs):
+        '''Build a glossary from CSV files with a header row naming GlossEntry fields, see from_files()'''
+        return cls.from_files(paths, title, kind="csv", errors=errors, jobs=jobs, **kwargs)
+
+    @classmethod
+    def from_jsonl(cls, paths, title:str, errors:str = "raise", jobs:int = 1, **kwargs):
+        '''Build a glossary from JSON Lines files with one entry object per line, see from_files()'''
+        return cls.from_files(paths, title, kind="jsonl", errors=errors, jobs=jobs, **kwargs)
+
+    @classmethod
+    def from_toml(cls, paths, title:str, errors:str = "raise", jobs:int = 1, **kwargs):
+        '''Build a glossary from TOML files with one [[entry]] table per entry, see from_files()'''
+        return cls.from_files(paths, title, kind="toml", errors=errors, jobs=jobs, **kwargs)
+
+    @classmethod
+    def open_snapshot(cls, path:str):
+        '''Open a file written by save_snapshot() as a read-only GlossSnapshot.GlossSnapshot,
+        which looks entries up by name without loading the rest of the glossary. Call its
+        to_glossary() method if you need a GreatGloss you can change.'''
+        return GlossSnapshot.GlossSnapshot(path)
+
+    def save_snapshot(self, path:str):
+        '''Save the glossary's title, updated date and entries to path in a compact binary
+        format that open_snapshot() can read back almost instantly, whatever the glossary's size'''
+        GlossSnapshot.write(self, path)
+
+    def __len__(self):
+        return len(self.glosslist)
+
+    def __iter__(self):
+        return iter(self.glosslist)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def _index_entry(self, entry:GlossEntry):
+        self._names[entry.name] = entry
+        self._casefolded.setdefault(entry.name.casefold(), []).append(entry)
+        if self._graph is not None:
+            self._graph.add(entry)
+
+    def _unindex_entry(self, entry:GlossEntry):
+        del self._names[entry.name]
+        for kept in self._rendered.values():
+            kept.pop(entry.name, None)
+        if self._graph is not None:
+            self._graph.remove(entry.name)
+        same_casefold = self._casefolded[entry.name.casefold()]
+        same_casefold.remove(entry)
+        if not same_casefold:
+            del self._casefolded[entry.name.casefold()]
+
+    def _position(self, name:str):
+        '''Return where the entry called name is in glosslist'''
+        if self._sortkeys is not None and not self._deferring:
+            i = bisect.bisect_left(self._sortkeys, self._collate(name))
+            while self.glosslist[i].name != name:  # entries whose keys tie
+                i += 1
+            return i
+        if self._positions is None:
+            self._positions = {entry.name: i for i, entry in enumerate(self.glosslist)}
+        return self._positions[name]
+
+    def reindex(self):
+        '''Rebuild the name index from glosslist. Only needed if you change glosslist or an
+        entry's name directly instead of going through GreatGloss methods.'''
+        self._names = {}
+        self._rendered = {}
+        self._casefolded = {}
+        self._positions = None
+        self._graph = None
+        for entry in self.glosslist:
+            if entry.name in self._names:
+                raise ValueError(f"More than one entry is named {entry.name!r}")
+            self._index_entry(entry)
+        if self._sortkeys is not None:
+            self.set_collation(self.collation)
+
+    def set_collation(self, collation):
+        '''Sort the glossary by collation (see GlossCollate) and keep it sorted from now on.
+        Each entry's collation key is worked out once and kept, so adding an entry only costs a
+        binary search, and nothing needs sorting when it's time to write the glossary.
+        Pass None to stop keeping entries sorted.'''
+        if collation is None:
+            self.collation = self._collate = self._sortkeys = None
+            return
+        collate = GlossCollate.get_collation(collation)
+        keyed = sorted(((collate(entry.name), entry) for entry in self.glosslist), key=lambda pair: pair[0])
+        self.glosslist[:] = [entry for _, entry in keyed]
+        self.collation = collation
+        self._collate = collate
+        self._sortkeys = [key for key, _ in keyed]
+        self._positions = None
 
     def add_entry(self, entry:GlossEntry):
-        '''Add a new entry to the glossary'''
-        self.glosslist.append(entry)
+        '''Add a new entry to the glossary. What happens if there is already an entry with the
+        same name depends on self.duplicates.'''
+        existing = self._names.get(entry.name)
+        if existing is None:
+            if self._sortkeys is not None and not self._deferring:
+                key = self._collate(entry.name)
+                i = bisect.bisect_right(self._sortkeys, key)
+                self._sortkeys.insert(i, key)
+                self.glosslist.insert(i, entry)
+                self._positions = None
+            else:
+                if self._positions is not None:
+                    self._positions[entry.name] = len(self.glosslist)
+                self.glosslist.append(entry)
+                if self._sortkeys is not None:
+                    self._sortkeys.append(self._collate(entry.name))
+            self._index_entry(entry)
+        elif self.duplicates == "error":
+            raise ValueError(f"Glossary {self.title!r} already has an entry named {entry.name!r}")
+        elif self.duplicates == "last":
+            self.replace_entry(entry.name, entry)
 
     def add_entries(self, entries:list):
         '''Add a list of entries to the glossary'''
-        for entry in entries:
-            self.add_entry(entry)
+        if self._sortkeys is None or self._deferring or len(entries) <= BULK_INSERT:
+            for entry in entries:
+                self.add_entry(entry)
+            return
+        # cheaper to put them all at the end and sort once; Timsort merges the sorted runs
+        self._deferring = True
+        self._positions = None
+        try:
+            for entry in entries:
+                self.add_entry(entry)
+        finally:
+            self._deferring = False
+            keyed = sorted(zip(self._sortkeys, self.glosslist), key=lambda pair: pair[0])
+            self.glosslist[:] = [entry for _, entry in keyed]
+            self._sortkeys = [key for key, _ in keyed]
+            self._positions = None
+
+    def get_entry(self, name:str, ignorecase:bool = False):
+        '''Return the entry called name, or raise a KeyError if there isn't one.
+        If ignorecase, match names case-insensitively; if several entries match, the one that
+        was added first is returned.'''
+        if not ignorecase:
+            return self._names[name]
+        matches = self._casefolded.get(name.casefold())
+        if not matches:
+            raise KeyError(name)
+        return matches[0]
+
+    def remove_entry(self, name:str):
+        '''Remove the entry called name from the glossary and return it'''
+        entry = self._names[name]
+        position = self._position(name)
+        del self.glosslist[position]
+        if self._sortkeys is not None:
+            del self._sortkeys[position]
+        self._unindex_entry(entry)
+        self._positions = None
+        return entry
+
+    def replace_entry(self, name:str, entry:GlossEntry):
+        '''Put entry where the entry called name currently is, and return the old entry.
+        entry does not have to share its name, but it can't take the name of some other entry.'''
+        old = self._names[name]
+        if entry.name != name and entry.name in self._names:
+            raise ValueError(f"Glossary {self.title!r} already has an entry named {entry.name!r}")
+        position = self._position(name)
+        if self._sortkeys is not None:
+            key = self._collate(entry.name)
+            if key != self._sortkeys[position] and not self._deferring:
+                # it belongs somewhere else now
+                self.remove_entry(name)
+                self.add_entry(entry)
+                return old
+            self._sortkeys[position] = key
+        self.glosslist[position] = entry
+        self._unindex_entry(old)
+        self._index_entry(entry)
+        if entry.name != name and self._positions is not None:
+            del self._positions[name]
+            self._positions[entry.name] = position
+        return old
+
+    def link_graph(self):
+        '''Return a GlossGraph of which entries link to which, with a search index of their words.
+        It is built the first time this is called, and from then on kept up to date by add_entry(),
+        remove_entry() and replace_entry(). If you edit an entry that is already in the glossary,
+        call replace_entry() with it afterwards (or reindex() after many edits).'''
+        if self._graph is None:
+            self._graph = GlossGraph.GlossGraph(self.glosslist)
+        return self._graph
+
+    def forget_rendered(self):
+        '''Free everything kept by keep_rendered, both whole entries and the fields of each entry.
+        The next render starts from scratch, and is kept again if keep_rendered is still True.'''
+        self._rendered = {}
+        for entry in self.glosslist:
+            entry.keep_rendered(False)
+
+    def compact(self, fields:tuple = SHARED_FIELDS):
+        '''Make entries with equal values in fields share a single object for that value. Fields
+        like institute or updated tend to repeat across thousands of entries, and entries loaded
+        from a file otherwise each carry their own copy. Returns how many copies were dropped.'''
+        dropped = 0
+        for field in fields:
+            shared: dict = {}
+            for entry in self.glosslist:
+                value = getattr(entry, field)
+                kept = shared.setdefault(value, value)
+                if kept is not value:
+                    setattr(entry, field, kept)
+                    dropped += 1
+        return dropped
 
     def add_source(self, format:str = "rst", sourcefile:str = None):
-        '''Include a note (as a comment if rst) on entry file to note it was created programatically'''
+        '''Include a note (as a comment if the format has them) on entry file to note it was created programatically'''
         if sourcefile:
             message = f"""DO NOT EDIT THIS FILE. This file is autogenerated from {sourcefile}, update that instead.\n"""
         else:
             message = """DO NOT EDIT THIS FILE. This file is autogenerated from a Python source file, update that instead.\n"""
-        if format == "rst":
-            return(f".. {message}\n")
-        else:
-            return message
+        return GlossFormat.get_format(format).source(message)
 
     def _generate_entry_names_(self, asRSTlinks:bool = False):
         '''Yield the name of every entry. If asRSTlinks==True, make them clickable internal links.
@@ -42,58 +467,355 @@ class GreatGloss(GlossTxt.GlossTxt):
             else:
                 yield f"{entry.return_name()}\n"
 
-    def sort_entries(self, ignorecase:bool = True):
-        '''Alphabetically sort all entries by their name field'''
-        if ignorecase:
-            self.glosslist.sort(key=lambda x: x.name.upper())
-        else:
-            self.glosslist.sort(key=lambda x: x.name)
+    def sort_entries(self, ignorecase:bool = True, collation=None, stats:GlossStats.GlossStats = None):
+        '''Alphabetically sort all entries by their name field.
+        collation - sort in this order instead (see GlossCollate); ignorecase is then ignored
+        If the glossary was made with a collation, it is already sorted and this does nothing,
+        unless a different collation is given, which the glossary then keeps to from then on.'''
+        with (stats or GlossStats.NULL_STATS).stage("sort"):
+            if self._sortkeys is not None:
+                if collation is not None and collation != self.collation:
+                    self.set_collation(collation)
+                return
+            if collation is None:
+                collation = "upper" if ignorecase else "exact"
+            collate = GlossCollate.get_collation(collation)
+            self.glosslist.sort(key=lambda x: collate(x.name))
+        self._positions = None
+
+    def iter_toc(self, format:str = "rst", columns:int = 3, skipSource:bool = True, sourcefile:str = None):
+        '''Yield the TOC one line at a time. make_toc() is the list version of this.
+        if columns>=1 && format=="rst": number of hlist columns to use
+        if columns<=0 && format=="rst": use Sphinx built in local TOC instead of hlist'''
+        renderer = GlossFormat.get_format(format)
+        if not skipSource:
+            yield self.add_source(format=format, sourcefile=sourcefile)
+        yield from renderer.toc(self.glosslist, columns)
 
     def make_toc(self, format:str, columns:int = 3, skipSource:bool = True, sourcefile:str = None):
         '''Generates a TOC as a list of strings
         if columns>=1 && format=="rst": number of hlist columns to use
         if columns<=0 && format=="rst": use Sphinx built in local TOC instead of hlist'''
-        TOC = []
+        return list(self.iter_toc(format=format, columns=columns, skipSource=skipSource, sourcefile=sourcefile))
+
+    def iter_render(self, format:str = "rst", skipTOC:bool = False, skipSource:bool = False, sourcefile:str = None,
+            columns:int = 3, timestamp:bool = False, cache:GlossCache.GlossCache = None, workers:int = 1,
+            executor="process", stats:GlossStats.GlossStats = None):
+        '''Yield the whole glossary as a stream of string fragments, in the order they belong in the
+        output: source note, title, TOC, then every entry. Nothing is rendered until it is asked for,
+        so memory use stays flat no matter how many entries there are.
+        If cache is a GlossCache, entries that haven't changed since it was saved are not re-rendered.
+        If workers > 1, entries are rendered in chunks across that many workers (processes by default,
+        or "thread", or any concurrent.futures.Executor), with the same output as rendering serially.
+        workers=0 means one per CPU. Small glossaries are always rendered serially.
+        If stats is a GlossStats, the time spent on the TOC and on rendering entries is added to it,
+        along with how many entries were rendered and how many links they have. Entries that came
+        from the cache or were kept from an earlier render aren't counted. Links are counted once
+        rendering is done, timed separately as "link_check".'''
+        stats = stats if stats is not None else GlossStats.NULL_STATS
+        renderer = GlossFormat.get_format(format)
+        start = renderer.start(self.title)
+        if start:
+            yield start
         if not skipSource:
-            TOC.append(self.add_source(format=format, sourcefile=sourcefile))
-        if format == "rst" or format == "RST":
-            if columns <= 0:
-                TOC.append(".. contents:: Table of Contents \n\t:local:\n\n")
-            else:
-                TOC.append(f".. hlist:: \n\t:columns: {columns}\n\n")
-            for entry in self._generate_entry_names_(asRSTlinks=True):
-                TOC.append(f"\t* {entry}\n")
+            yield self.add_source(format=format, sourcefile=sourcefile)
+        yield from renderer.title(self.title)
+        if not skipTOC:
+            yield from stats.timed("toc", self._iter_toc(renderer, columns))
+            yield renderer.toc_end()
+        if not stats.enabled:
+            yield from self._iter_entries(renderer, timestamp, cache, workers, executor)
         else:
-            for entry in self._generate_entry_names_(asRSTlinks=False):
-                TOC.append(entry)
-        return TOC
+            hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+            rendered: list = []
+            yield from stats.timed("render", self._iter_entries(renderer, timestamp, cache, workers, executor, rendered))
+            stats.count("entries_rendered", len(rendered))
+            with stats.stage("link_check"):
+                self.count_links(stats, rendered)
+            if cache is not None:
+                stats.count("cache_hits", cache.hits - hits)
+                stats.count("cache_misses", cache.misses - misses)
+        end = renderer.end()
+        if end:
+            yield end
 
-    def write_glossary(self, outfile:str = "", format:str = "rst", skipTOC:bool = False, skipSource:bool = False, sourcefile:str = None):
+    def _iter_toc(self, renderer:GlossFormat.Renderer, columns:int):
+        '''Yield the TOC, as iter_toc() does, reusing lines kept from the last render if keep_rendered
+        is True. An entry's line in the TOC only depends on its name.'''
+        if not self.keep_rendered:
+            yield from renderer.toc(self.glosslist, columns)
+            return
+        kept = self._rendered.setdefault((renderer, "toc"), {})
+        start = renderer.toc_start(columns)
+        if start:
+            yield start
+        toc_line = renderer.toc_line
+        for entry in self.glosslist:
+            line = kept.get(entry.name)
+            if line is None:
+                line = kept[entry.name] = toc_line(entry)
+            yield line
+        finish = renderer.toc_finish()
+        if finish:
+            yield finish
+
+    def count_links(self, stats:GlossStats.GlossStats, entries:list = None):
+        '''Add how many [links] entries (by default, every entry) have to stats: links_resolved for
+        links to an entry in this glossary, links_dangling for links to anything else, and
+        malformed_links for links that RST can't render (see GlossEntry.check_links()). Links from
+        a shard count as resolved if they point anywhere in the glossary it was split from.'''
+        names = (self.parent or self)._names
+        resolved = dangling = malformed = 0
+        for entry in self.glosslist if entries is None else entries:
+            for field in (entry.acronym_full, entry.definition, entry.seealso):
+                if "[" not in field and "]" not in field:
+                    continue
+                found: list = []
+                for target in GlossLink.link_targets(field, found):
+                    if target in names:
+                        resolved += 1
+                    else:
+                        dangling += 1
+                malformed += len(found)
+        stats.count("links_resolved", resolved)
+        stats.count("links_dangling", dangling)
+        stats.count("malformed_links", malformed)
+
+    def _iter_entries(self, renderer:GlossFormat.Renderer, timestamp:bool, cache:GlossCache.GlossCache, workers:int,
+            executor, rendered:list = None):
+        '''Yield every rendered entry, see iter_render(). If rendered is a list, the entries that
+        had to be rendered, rather than coming from cache or from what was kept, are added to it.'''
+        if workers == 0:
+            workers = os.cpu_count() or 1
+        kept = self._rendered.setdefault((renderer, timestamp), {}) if self.keep_rendered else None
+        if workers > 1 and len(self.glosslist) >= PARALLEL_MIN_ENTRIES:
+            yield from _render_parallel(self.glosslist, renderer.name, timestamp, workers, executor, cache, kept,
+                rendered)
+        elif kept is not None or cache is not None:
+            render = renderer.render
+            for entry in self.glosslist:
+                if kept is not None:
+                    values = _ENTRY_VALUES(entry)
+                    fragment = _kept_fragment(kept, values)
+                    if fragment is not None:
+                        if cache is not None:  # so saving the cache keeps what was kept
+                            cache.store(cache.key(entry, renderer.name, timestamp), fragment)
+                        yield fragment
+                        continue
+                    entry.keep_rendered()  # so only the fields that changed are rendered next time
+                if cache is not None:
+                    key = cache.key(entry, renderer.name, timestamp)
+                    fragment = cache.lookup(key)
+                if fragment is None:
+                    fragment = render(entry, timestamp)
+                    if cache is not None:
+                        cache.store(key, fragment)
+                    if rendered is not None:
+                        rendered.append(entry)
+                if kept is not None:
+                    kept[values[0]] = (values, fragment)
+                yield fragment
+        else:
+            render = renderer.render
+            for entry in self.glosslist:
+                yield render(entry, timestamp)
+            if rendered is not None:
+                rendered.extend(self.glosslist)
+
+    def render_to(self, stream, format:str = "rst", skipTOC:bool = False, skipSource:bool = False, sourcefile:str = None,
+            columns:int = 3, timestamp:bool = False, buffersize:int = DEFAULT_BUFFER_SIZE, cache:GlossCache.GlossCache = None,
+            workers:int = 1, executor="process", stats:GlossStats.GlossStats = None):
+        '''Write the glossary to any file-like object with a write() method, such as an open file,
+        sys.stdout, or io.StringIO. Fragments from iter_render() are collected until roughly
+        buffersize characters are pending, then handed to stream.write() in one call.
+        Returns the number of characters written.'''
+        return _write_buffered(stream, self.iter_render(format=format, skipTOC=skipTOC, skipSource=skipSource,
+            sourcefile=sourcefile, columns=columns, timestamp=timestamp, cache=cache, workers=workers, executor=executor,
+            stats=stats), buffersize, stats)
+
+    def write_glossary(self, outfile:str = "", format:str = "rst", skipTOC:bool = False, skipSource:bool = False, sourcefile:str = None,
+            append:bool = True, columns:int = 3, timestamp:bool = False, buffersize:int = DEFAULT_BUFFER_SIZE, cache=None,
+            workers:int = 1, executor="process", stats:GlossStats.GlossStats = None):
         '''Write a glossary to a file, in plaintext or RST formatting.
-        will try to fall back on self.outfile if outfile not declared when calling this function'''
+        will try to fall back on self.outfile if outfile not declared when calling this function
+        append: if True (default), add to the end of an existing file; if False, overwrite it, but
+            only if the new output is different, so an unchanged glossary keeps its old mtime
+        cache: a GlossCache, or the path of a cache file, used to skip re-rendering unchanged
+            entries; it is saved once the glossary has been written
+        workers, executor: render entries in parallel, see iter_render()
+        stats: a GlossStats to add timings and counters to, see iter_render()
+        Returns True if the file was written to.'''
         if outfile == "" and self.outfile == "":
             raise RuntimeError("No output file for glossary specified")
-        with open(outfile if outfile != "" else self.outfile, "a") as f:
-            if not skipSource:
-                f.write(self.add_source(format=format, sourcefile=sourcefile))
-            f.write("".join(self.text_glossary_title()))
-            if not skipTOC:
-                f.write("".join(self.make_toc(format=format)))
-                f.write("\n")  # needed to keep RST from getting mad
-            for entry in self.glosslist:
-                f.write(entry.generate_RST())
+        stats = stats if stats is not None else GlossStats.NULL_STATS
+        if isinstance(cache, str):
+            with stats.stage("cache_load"):
+                cache = GlossCache.GlossCache(cache)
+        fragments = self.iter_render(format=format, skipTOC=skipTOC, skipSource=skipSource, sourcefile=sourcefile,
+            columns=columns, timestamp=timestamp, cache=cache, workers=workers, executor=executor, stats=stats)
+        path = outfile if outfile != "" else self.outfile
+        if append:
+            with open(path, "a", buffering=buffersize) as f:
+                _write_buffered(f, fragments, buffersize, stats)
+            changed = True
+        else:
+            changed = GlossCache.write_if_changed(path, fragments, lambda f, fragments: _write_buffered(f, fragments, buffersize, stats))
+        stats.count("files_written" if changed else "files_unchanged")
+        if cache is not None:
+            with stats.stage("cache_save"):
+                cache.save()
+        return changed
 
-    def write_toc(self, outtoc:str = "", format:str = "rst", columns:int = 0, skipSource:bool = False, sourcefile:str = None):
+    def write_toc(self, outtoc:str = "", format:str = "rst", columns:int = 0, skipSource:bool = False, sourcefile:str = None,
+            append:bool = True, buffersize:int = DEFAULT_BUFFER_SIZE, stats:GlossStats.GlossStats = None):
         '''Write a table of contents to outtoc.
         Will try to fall back on self.outtoc if outtoc not declared when calling this function
         if columns>=1 && format=="rst": number of hlist columns to use
-        if columns<=0 && format=="rst": use Sphinx built in local TOC instead of hlist'''
+        if columns<=0 && format=="rst": use Sphinx built in local TOC instead of hlist
+        append: if True (default), add to the end of an existing file; if False, overwrite it, but
+            only if the new TOC is different, as in write_glossary()
+        stats: a GlossStats to add the time spent on the TOC and writing it to
+        Returns True if the file was written to.'''
+        stats = stats if stats is not None else GlossStats.NULL_STATS
         if outtoc == "" and self.outtoc == "":
             print("No output file for TOC specified, defaulting to toc.rst")
-            with open("toc.rst", "a") as f:
-                f.write("".join(self.make_toc(format=format, columns=columns, skipSource=skipSource, sourcefile=sourcefile)))
-        with open(outtoc if outtoc != "" else self.outtoc, "a") as f:
-            f.write("".join(self.make_toc(format=format, columns=columns, skipSource=skipSource, sourcefile=sourcefile)))
+            outtoc = "toc.rst"
+        path = outtoc if outtoc != "" else self.outtoc
+        toc = stats.timed("toc", self.iter_toc(format=format, columns=columns, skipSource=skipSource, sourcefile=sourcefile))
+        if append:
+            with open(path, "a", buffering=buffersize) as f:
+                _write_buffered(f, toc, buffersize, stats)
+            changed = True
+        else:
+            changed = GlossCache.write_if_changed(path, toc, lambda f, toc: _write_buffered(f, toc, buffersize, stats))
+        stats.count("files_written" if changed else "files_unchanged")
+        return changed
+
+    def shard(self, by="letter", max_entries:int = None):
+        '''Split the glossary into smaller glossaries, keeping entries in their current order.
+        by - "letter" to group entries by the first letter of their name, a function that takes
+            an entry and returns the name of the group it belongs in, or None to not group them
+        max_entries - split any group with more than this many entries into several shards
+        Returns a list of (slug, GreatGloss) pairs, where slug is a short filename-safe name for
+        the shard. Each shard's title is the name of its group, or its first and last entry.
+        Shards are listed in the order their first entry appears in the glossary.'''
+        if by == "letter":
+            by = _shard_letter
+        elif by is not None and not callable(by):
+            raise ValueError(f"by must be one of {SHARD_BY} or a function, not {by!r}")
+        if by is None and not max_entries:
+            raise ValueError("Sharding needs a way to group entries (by) or a maximum shard size (max_entries)")
+        groups: dict = {}
+        for entry in self.glosslist:
+            groups.setdefault(str(by(entry)) if by else "", []).append(entry)
+        shards = []
+        used_slugs: set = set()
+        for label, entries in groups.items():
+            parts = [entries]
+            if max_entries and len(entries) > max_entries:
+                parts = [entries[i:i + max_entries] for i in range(0, len(entries), max_entries)]
+            for number, part in enumerate(parts, start=1):
+                if not label:
+                    title = f"{part[0].name} – {part[-1].name}"
+                    slug = str(number)
+                elif len(parts) > 1:
+                    title = f"{label} ({part[0].name} – {part[-1].name})"
+                    slug = f"{_slug(label)}-{number}"
+                else:
+                    title = label
+                    slug = _slug(label)
+                while slug in used_slugs:
+                    slug += "_"
+                used_slugs.add(slug)
+                shard = GreatGloss(title, updated=self.updated, duplicates=self.duplicates,
+                    keep_rendered=self.keep_rendered)
+                shard.glosslist = part
+                shard.parent = self
+                shard.reindex()
+                shards.append((slug, shard))
+        return shards
+
+    def iter_shard_index(self, shards:list, format:str = "rst", columns:int = 3, skipTOC:bool = False,
+            skipSource:bool = False, sourcefile:str = None, basename:str = "glossary"):
+        '''Yield the index page for shards made by shard(): the glossary's title, then (in formats
+        that link between pages) a list of the shard pages, then the name of each shard with a TOC
+        of its entries'''
+        renderer = GlossFormat.get_format(format)
+        start = renderer.start(self.title)
+        if start:
+            yield start
+        if not skipSource:
+            yield self.add_source(format=format, sourcefile=sourcefile)
+        yield from renderer.title(self.title)
+        yield from renderer.pages([(shard.title, f"{basename}_{slug}") for slug, shard in shards])
+        for slug, shard in shards:
+            yield "\n"
+            yield from renderer.heading(shard.title)
+            if not skipTOC:
+                yield from renderer.toc(shard.glosslist, columns, page=f"{basename}_{slug}")
+        yield "\n"
+        end = renderer.end()
+        if end:
+            yield end
+
+    def write_sharded(self, outdir:str, by="letter", max_entries:int = None, format:str = "rst", basename:str = "glossary",
+            skipTOC:bool = False, skipSource:bool = False, sourcefile:str = None, columns:int = 3, timestamp:bool = False,
+            buffersize:int = DEFAULT_BUFFER_SIZE, cache=None, workers:int = 1, executor="process",
+            stats:GlossStats.GlossStats = None):
+        '''Write the glossary as one file per shard (see shard()) plus an index page, all in outdir.
+        Shards are written to {basename}_{slug}.rst (or .txt, .md, etc) and the index to {basename}.rst.
+        Links between entries keep working across shards, since Sphinx labels are global.
+        Files are overwritten only if their contents changed. cache is shared by every shard.
+        The shards written are listed in .{basename}.{extension}.shards in outdir, so that shard
+        files left over from an earlier run that sharded differently can be removed.
+        Returns the paths written, index first.'''
+        stats = stats if stats is not None else GlossStats.NULL_STATS
+        extension = GlossFormat.get_format(format).extension
+        with stats.stage("shard"):
+            shards = self.shard(by=by, max_entries=max_entries)
+        os.makedirs(outdir, exist_ok=True)
+        if isinstance(cache, str):
+            cache = GlossCache.GlossCache(cache)
+
+        def write(stream, fragments):
+            _write_buffered(stream, fragments, buffersize, stats)
+
+        index = os.path.join(outdir, f"{basename}.{extension}")
+        changed = GlossCache.write_if_changed(index, self.iter_shard_index(shards, format=format, columns=columns, skipTOC=skipTOC,
+            skipSource=skipSource, sourcefile=sourcefile, basename=basename), write)
+        stats.count("files_written" if changed else "files_unchanged")
+        paths = [index]
+        for slug, shard in shards:
+            path = os.path.join(outdir, f"{basename}_{slug}.{extension}")
+            changed = GlossCache.write_if_changed(path, shard.iter_render(format=format, skipTOC=skipTOC, skipSource=skipSource,
+                sourcefile=sourcefile, columns=columns, timestamp=timestamp, cache=cache, workers=workers,
+                executor=executor, stats=stats), write)
+            stats.count("files_written" if changed else "files_unchanged")
+            paths.append(path)
+        self._remove_old_shards(os.path.join(outdir, f".{basename}.{extension}.shards"), paths[1:], stats)
+        if cache is not None:
+            with stats.stage("cache_save"):
+                cache.save()
+        return paths
+
+    def _remove_old_shards(self, manifest:str, paths:list, stats:GlossStats.GlossStats):
+        '''Delete the shards listed in manifest that aren't in paths, then list paths in it instead.
+        Only files write_sharded() wrote are ever deleted.'''
+        names = [os.path.basename(path) for path in paths]
+        try:
+            with open(manifest, "r", encoding="utf-8") as f:
+                old = f.read().splitlines()
+        except OSError:
+            old = []
+        directory = os.path.dirname(manifest)
+        for name in set(old) - set(names):
+            if name and os.path.basename(name) == name:  # never anything outside outdir
+                try:
+                    os.unlink(os.path.join(directory, name))
+                    stats.count("files_removed")
+                except FileNotFoundError:
+                    pass
+        GlossCache.write_if_changed(manifest, names, lambda stream, names: stream.writelines(f"{name}\n" for name in names))
 
     def text_glossary_title(self):
         '''Generate the overall glossary's title'''
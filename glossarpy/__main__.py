@@ -0,0 +1,4 @@
+import sys
+from glossarpy import GlossCLI
+
+sys.exit(GlossCLI.main())
@@ -0,0 +1,257 @@
+'''Sphinx extension that puts a glossary straight into a page, without writing RST first.
+Add "glossarpy.sphinx" to extensions in conf.py, then in any page:
+
+    .. glossarpy:: ../glossary/entries.jsonl
+
+Sources are CSV, JSON Lines, TOML or Python files, as in a glossarpy build config, relative to
+the page. Each entry becomes a section with a "dict <name>" label, so :ref:`dict cat` works
+from any page of the project, just as it does with RST written by write_glossary().'''
+from docutils import nodes
+from docutils.parsers.rst import directives
+from docutils.transforms import parts
+from sphinx import addnodes
+from sphinx.util import logging
+from sphinx.util.docutils import SphinxDirective
+from . import GlossCLI
+from . import GlossFormat
+from . import GlossLink
+from . import GlossLoad
+from . import GreatGloss
+
+ENV_VERSION = 1  # bump whenever what is kept in the Sphinx environment changes
+
+logger = logging.getLogger(__name__)
+
+
+def _label(name:str):
+    '''The label of an entry, as Sphinx stores it (ex: "dict seven bridges")'''
+    return nodes.fully_normalize_name(f"dict {name}")
+
+
+def _load(sources:list, collation, duplicates:str):
+    '''Return the entries of a glossary built from sources, in glossary order'''
+    glossary = GreatGloss.GreatGloss("", duplicates=duplicates, collation=collation)
+    shared: dict = {}
+    for source in sources:
+        GlossLoad.add_file(glossary, source, shared)
+    return list(glossary.glosslist)
+
+
+def _collation(argument):
+    return None if argument.strip().lower() == "none" else argument.strip()
+
+
+def _duplicates(argument):
+    return directives.choice(argument, ("error", "first", "last"))
+
+
+class GlossarpyDirective(SphinxDirective):
+    '''.. glossarpy:: source [source ...]
+
+    Options:
+    :columns: number of columns of the TOC (default 3), or 0 for a local table of contents
+    :skip-toc: leave the TOC out
+    :timestamp: add a comment to each entry saying when it was updated
+    :collation: how to sort entries (default "upper", see GlossCollate), or "none" to keep
+        them in the order they were loaded
+    :duplicates: "error" (default), "first" or "last", as in GreatGloss()'''
+    required_arguments = 1
+    optional_arguments = 100
+    option_spec = {
+        "columns": int,
+        "skip-toc": directives.flag,
+        "timestamp": directives.flag,
+        "collation": _collation,
+        "duplicates": _duplicates,
+    }
+
+    def run(self):
+        env = self.env
+        sources = [env.relfn2path(argument, env.docname)[1] for argument in self.arguments]
+        for source in sources:
+            env.note_dependency(source)  # so the page is read again when a source changes
+        collation = self.options.get("collation", "upper")
+        duplicates = self.options.get("duplicates", "error")
+        key = (tuple(sources), tuple(GlossCLI.file_stamp(source) for source in sources), collation, duplicates)
+
+        built = env.glossarpy_glossaries
+        entries = built.get(key)
+        if entries is None:
+            try:
+                entries = _load(sources, collation, duplicates)
+            except (OSError, ValueError) as e:  # GlossLoadError is a ValueError
+                raise self.error(f"glossarpy: {e}")
+            # one version of a glossary is kept at a time, whichever page asked for it last
+            for other in [other for other in built if other[0] == key[0]]:
+                del built[other]
+            built[key] = entries
+        env.glossarpy_documents.setdefault(env.docname, set()).add(key)
+
+        output = []
+        if "skip-toc" not in self.options:
+            output.extend(self.toc(entries, self.options.get("columns", 3)))
+        timestamp = "timestamp" in self.options
+        output.extend(self.entry(entry, timestamp) for entry in entries)
+        return output
+
+    def toc(self, entries:list, columns:int):
+        '''An hlist of links to every entry, as the hlist directive would make it, or a local
+        table of contents like the contents directive makes'''
+        if columns <= 0:
+            document = self.state.document
+            topic = nodes.topic(classes=["contents", "local"])
+            topic += nodes.title("", "Table of Contents")
+            name = nodes.fully_normalize_name("Table of Contents")
+            if not document.has_name(name):
+                topic["names"].append(name)
+            document.note_implicit_target(topic)
+            pending = nodes.pending(parts.Contents, {"local": None})
+            document.note_pending(pending)
+            topic += pending
+            return [topic]
+        items = [nodes.list_item("", nodes.paragraph("", "", self.link(entry.name))) for entry in entries]
+        per_column, longer = divmod(len(items), columns)
+        hlist = addnodes.hlist()
+        hlist["ncolumns"] = str(columns)
+        start = 0
+        for column in range(columns):
+            end = start + per_column + (1 if column < longer else 0)
+            hlist += addnodes.hlistcol("", nodes.bullet_list("", *items[start:end]))
+            start = end
+        return [hlist]
+
+    def link(self, name:str):
+        '''A :ref: to the entry called name'''
+        target = _label(name)
+        node = addnodes.pending_xref("", nodes.inline(name, name, classes=["xref", "std", "std-ref"]),
+            refdomain="std", reftype="ref", reftarget=target, refexplicit=False, refwarn=True,
+            refdoc=self.env.docname)
+        self.set_source_info(node)
+        return node
+
+    def text(self, entry, field:str):
+        '''The text of a field as nodes, with each [link] turned into a :ref:, and whitespace
+        collapsed the same way RST output does'''
+        text = getattr(entry, field)
+        if "[" not in text and "]" not in text:
+            return [nodes.Text(" ".join(text.split()))]
+        found: list = []
+        pieces: list = []
+        for token in GlossLink.iter_tokens(text, found):
+            if token.kind == GlossLink.LINK and token.closed:
+                pieces.append(self.link(" ".join(token.text.split())))
+                pieces.append(token.suffix)
+            elif token.kind == GlossLink.LINK:
+                pieces.append("[" + token.text)
+            else:
+                pieces.append(token.text)
+        for diagnostic in found:
+            logger.warning(f"{entry.name}: {diagnostic._replace(field=field)}", location=(self.env.docname, self.lineno))
+
+        out: list = []
+        words: list = []
+
+        def flush(last:bool):
+            raw = "".join(words)
+            words.clear()
+            before = " " if out and raw[:1].isspace() else ""
+            after = " " if not last and raw[-1:].isspace() else ""
+            text = " ".join(raw.split())
+            if text:
+                text = before + text + after
+            elif out and raw and not last:  # only whitespace between two links
+                text = " "
+            if text:
+                out.append(nodes.Text(text))
+
+        for piece in pieces:
+            if isinstance(piece, str):
+                if piece:
+                    words.append(piece)
+            else:
+                flush(last=False)
+                out.append(piece)
+        flush(last=True)
+        return out
+
+    def entry(self, entry, timestamp:bool = False):
+        '''An entry as a section, laid out the same way as RST output'''
+        label = _label(entry.name)
+        section = nodes.section(names=[label])
+        section += nodes.title(entry.name, entry.name)
+        # registers the label with the standard domain, so :ref:`dict {name}` works anywhere, and
+        # gives the section an id of its own, even if the name is only told apart by punctuation
+        self.state.document.note_explicit_target(section)
+        self.set_source_info(section)
+        if entry.pronunciation != "":
+            section += nodes.paragraph("", f"[pronounced {entry.pronunciation}]")
+        if entry.acronym_full != "":
+            section += nodes.paragraph("", "", nodes.emphasis("", "abbreviation for"), nodes.Text(" "),
+                *self.text(entry, "acronym_full"))
+        if entry.definition != "":
+            section += nodes.block_quote("", nodes.paragraph("", "", *self.text(entry, "definition")))
+        if entry.institute != "":
+            section += nodes.note("", nodes.paragraph("", GlossFormat.INSTITUTE_NOTE.format(entry.institute)))
+        if entry.seealso != "":
+            section += nodes.paragraph("", "", nodes.Text("see also "), *self.text(entry, "seealso"))
+        if entry.furtherreading != "":
+            section += nodes.paragraph("", "", nodes.Text("Further reading: "), self.further_reading(entry.furtherreading))
+        if timestamp:
+            section += nodes.comment("", entry.updated.strftime("updated %Y-%m-%d"))
+        return section
+
+    def further_reading(self, url:str):
+        '''External URLs become links; anything else is assumed to be another page'''
+        if GlossFormat._is_external(url):
+            return nodes.reference(url, url, refuri=GlossFormat._url(url, "html"))
+        node = addnodes.pending_xref("", nodes.inline(url, url, classes=["xref", "std", "std-doc"]),
+            refdomain="std", reftype="doc", reftarget=url, refexplicit=True, refwarn=True,
+            refdoc=self.env.docname)
+        self.set_source_info(node)
+        return node
+
+
+def init_env(app, env, docnames):
+    '''Give the environment somewhere to keep built glossaries, if it doesn't have one yet'''
+    if not hasattr(env, "glossarpy_glossaries"):
+        env.glossarpy_glossaries = {}  # (sources, their stamps, collation, duplicates) -> entries
+        env.glossarpy_documents = {}  # document -> keys of the glossaries it shows
+
+
+def purge_doc(app, env, docname):
+    '''Forget which glossaries docname shows. They are kept until every document has been
+    read, so one that hasn't changed doesn't have to be loaded again when docname is.'''
+    if hasattr(env, "glossarpy_documents"):
+        env.glossarpy_documents.pop(docname, None)
+
+
+def drop_unused(app, env):
+    '''Once every document has been read, forget glossaries that none of them show'''
+    if hasattr(env, "glossarpy_glossaries"):
+        used = set().union(*env.glossarpy_documents.values())
+        for key in [key for key in env.glossarpy_glossaries if key not in used]:
+            del env.glossarpy_glossaries[key]
+    return []
+
+
+def merge_info(app, env, docnames, other):
+    '''Bring in what a parallel reader built'''
+    if not hasattr(other, "glossarpy_glossaries"):
+        return
+    init_env(app, env, docnames)
+    for docname in docnames:
+        if docname in other.glossarpy_documents:
+            keys = other.glossarpy_documents[docname]
+            env.glossarpy_documents[docname] = keys
+            for key in keys:
+                if key in other.glossarpy_glossaries:
+                    env.glossarpy_glossaries[key] = other.glossarpy_glossaries[key]
+
+
+def setup(app):
+    app.add_directive("glossarpy", GlossarpyDirective)
+    app.connect("env-before-read-docs", init_env)
+    app.connect("env-purge-doc", purge_doc)
+    app.connect("env-merge-info", merge_info)
+    app.connect("env-updated", drop_unused)
+    return {"env_version": ENV_VERSION, "parallel_read_safe": True, "parallel_write_safe": True}
@@ -15,6 +15,8 @@ setup(
     include_package_data=True,
     package_data={"glossarpy": ["*.md", "*.pyi"]},
     zip_safe=False,
+    entry_points={"console_scripts": ["glossarpy = glossarpy.GlossCLI:main"]},
+    extras_require={"sphinx": ["sphinx"]},
     url='https://github.com/aofarrel/glossarpy.git',
     platforms=["MacOS X", "Posix"],
     license="Apache 2.0",
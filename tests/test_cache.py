@@ -0,0 +1,133 @@
+'''Checks the rebuild cache and the writes that only replace a file if it changed.
+Run with python3 -m unittest discover tests (or pytest).'''
+import datetime
+import json
+import os
+import stat
+import tempfile
+import unittest
+from glossarpy import GlossCache
+from glossarpy import GlossFormat
+from glossarpy import GreatGloss
+from glossarpy.GlossEntry import GlossEntry
+
+
+def _glossary(definitions:dict):
+    glossary = GreatGloss.GreatGloss("Cached", updated=datetime.date(2022, 6, 1), collation="upper")
+    for name, definition in definitions.items():
+        glossary.add_entry(GlossEntry(name, definition=definition, updated=datetime.date(2022, 6, 1)))
+    return glossary
+
+
+class CacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = os.path.join(self.directory.name, "cache.json")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name:str):
+        return os.path.join(self.directory.name, name)
+
+    def leftovers(self):
+        return [name for name in os.listdir(self.directory.name) if name.endswith(".tmp")]
+
+    def test_same_output_as_without_cache(self):
+        definitions = {f"term {i}": f"links to [term {(i * 3) % 20}]" for i in range(20)}
+        for edit in range(4):
+            glossary = _glossary(definitions)
+            for format in ("rst", "txt", "md", "html"):
+                expected = "".join(glossary.iter_render(format=format))
+                with GlossCache.GlossCache(self.cache + format) as cache:
+                    self.assertEqual("".join(glossary.iter_render(format=format, cache=cache)), expected, format)
+                    if edit:
+                        self.assertEqual(cache.misses, 1, format)  # only the edited entry
+            definitions[f"term {edit}"] = f"edited {edit}"
+
+    def test_save_keeps_only_what_was_used(self):
+        entries = [GlossEntry(f"term {i}", definition=str(i)) for i in range(5)]
+        with GlossCache.GlossCache(self.cache) as cache:
+            for entry in entries:
+                cache.render(entry)
+        with GlossCache.GlossCache(self.cache) as cache:
+            for entry in entries[:2]:
+                cache.render(entry)
+            self.assertEqual((cache.hits, cache.misses), (2, 0))
+        with open(self.cache, encoding="utf-8") as f:
+            self.assertEqual(len(json.load(f)["fragments"]), 2)
+
+    def test_key(self):
+        cache = GlossCache.GlossCache(self.cache)
+        entry = GlossEntry("term", definition="a definition", updated=datetime.date(2022, 6, 1))
+        keys = {cache.key(entry, format, timestamp) for format in ("rst", "txt", "md", "html") for timestamp in (False, True)}
+        self.assertEqual(len(keys), 8)
+        same = GlossEntry("term", definition="a definition", updated=datetime.date(2022, 6, 1))
+        self.assertEqual(cache.key(entry), cache.key(same))
+        same.updated = datetime.date(2023, 1, 1)
+        self.assertEqual(cache.key(entry), cache.key(same))  # the date only shows with timestamp
+        self.assertNotEqual(cache.key(entry, timestamp=True), cache.key(same, timestamp=True))
+        renderer = GlossFormat.get_format("rst")
+        before = cache.key(entry)
+        renderer.version += 1
+        try:
+            self.assertNotEqual(cache.key(entry), before)
+        finally:
+            renderer.version -= 1
+
+    def test_unreadable_cache_is_empty(self):
+        for text in ("not json", json.dumps({"version": GlossCache.CACHE_VERSION - 1, "fragments": {"a": "b"}}), "[]"):
+            with open(self.cache, "w", encoding="utf-8") as f:
+                f.write(text)
+            cache = GlossCache.GlossCache(self.cache)
+            self.assertIsNone(cache.lookup("a"))
+
+    def test_write_if_changed(self):
+        path = self.path("output.txt")
+
+        def write(f, fragments):
+            f.writelines(fragments)
+
+        self.assertTrue(GlossCache.write_if_changed(path, ["one\n", "two\n"], write))
+        os.utime(path, ns=(1, 1))
+        self.assertFalse(GlossCache.write_if_changed(path, ["one\ntwo\n"], write))
+        self.assertEqual(os.stat(path).st_mtime_ns, 1)
+        self.assertTrue(GlossCache.write_if_changed(path, ["one\nthree\n"], write))
+        with open(path) as f:
+            self.assertEqual(f.read(), "one\nthree\n")
+        self.assertEqual(self.leftovers(), [])
+
+    def test_failed_write_leaves_nothing_behind(self):
+        path = self.path("output.txt")
+        GlossCache.write_atomic(path, "before\n")
+
+        def fail(f, fragments):
+            f.write("half")
+            raise RuntimeError("failed part way")
+
+        with self.assertRaises(RuntimeError):
+            GlossCache.write_if_changed(path, [], fail)
+        with self.assertRaises(TypeError):
+            GlossCache.write_atomic(path, ["half", b"bytes in a text file"])
+        with open(path) as f:
+            self.assertEqual(f.read(), "before\n")
+        self.assertEqual(self.leftovers(), [])
+
+    def test_permissions(self):
+        umask = os.umask(0o022)
+        try:
+            path = self.path("new.txt")
+            GlossCache.write_atomic(path, "new\n")
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+            os.chmod(path, 0o640)
+            GlossCache.write_if_changed(path, ["changed\n"], lambda f, fragments: f.writelines(fragments))
+            self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o640)
+            with GlossCache.GlossCache(self.cache):
+                pass
+            self.assertEqual(stat.S_IMODE(os.stat(self.cache).st_mode), 0o644)
+        finally:
+            os.umask(umask)
+
+
+if __name__ == "__main__":
+    unittest.main()
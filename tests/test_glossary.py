@@ -0,0 +1,130 @@
+'''Checks that GreatGloss's name index agrees with glosslist, and that a sorted glossary stays
+sorted, through any sequence of changes.
+Run with python3 -m unittest discover tests (or pytest).'''
+import random
+import unittest
+from glossarpy import GlossCollate
+from glossarpy import GreatGloss
+from glossarpy.GlossEntry import GlossEntry
+
+NAMES = ["cat", "Cat", "CAT", "dog", "Dog", "straße", "STRASSE", "Seven Bridges", "seven bridges", "v2", "v10", ".bashrc"]
+
+
+class IndexTest(unittest.TestCase):
+    def assertIndexed(self, glossary, model:list, added:dict):
+        '''glossary has exactly the entries in model, in that order. added is each entry's
+        position in the order entries were indexed, to check which one ignorecase finds.'''
+        self.assertEqual(len(glossary), len(model))
+        self.assertEqual([id(entry) for entry in glossary.glosslist], [id(entry) for entry in model])
+        for name in NAMES:
+            matches = [entry for entry in model if entry.name == name]
+            if matches:
+                self.assertIn(name, glossary)
+                self.assertIs(glossary.get_entry(name), matches[0])
+            else:
+                self.assertNotIn(name, glossary)
+                with self.assertRaises(KeyError):
+                    glossary.get_entry(name)
+            folded = [entry for entry in model if entry.name.casefold() == name.casefold()]
+            if folded:
+                self.assertIs(glossary.get_entry(name, ignorecase=True), min(folded, key=lambda entry: added[id(entry)]))
+            else:
+                with self.assertRaises(KeyError):
+                    glossary.get_entry(name, ignorecase=True)
+
+    def test_random_changes(self):
+        for seed in range(60):
+            rng = random.Random(seed)
+            duplicates = rng.choice(GreatGloss.DUPLICATE_POLICIES)
+            glossary = GreatGloss.GreatGloss("Indexed", duplicates=duplicates)
+            model: list = []
+            added: dict = {}
+            count = 0
+            for step in range(80):
+                label = f"seed {seed}, step {step}, duplicates={duplicates}"
+                change = rng.choice(("add", "add", "remove", "replace", "sort"))
+                present = [entry.name for entry in model]
+                entry = GlossEntry(rng.choice(NAMES), definition=str(step))
+                if change == "add":
+                    if entry.name not in present:
+                        glossary.add_entry(entry)
+                        model.append(entry)
+                    elif duplicates == "error":
+                        with self.assertRaises(ValueError):
+                            glossary.add_entry(entry)
+                        continue
+                    else:
+                        glossary.add_entry(entry)
+                        if duplicates == "first":
+                            continue
+                        model[present.index(entry.name)] = entry
+                elif change == "remove" and model:
+                    name = rng.choice(present)
+                    self.assertIs(glossary.remove_entry(name), model.pop(present.index(name)), label)
+                    continue
+                elif change == "replace" and model:
+                    name = rng.choice(present)
+                    if entry.name != name and entry.name in present:
+                        with self.assertRaises(ValueError):
+                            glossary.replace_entry(name, entry)
+                        continue
+                    self.assertIs(glossary.replace_entry(name, entry), model[present.index(name)], label)
+                    model[present.index(name)] = entry
+                elif change == "sort":
+                    glossary.sort_entries()
+                    model.sort(key=lambda entry: entry.name.upper())
+                    continue
+                else:
+                    continue
+                added[id(entry)] = count
+                count += 1
+                self.assertIndexed(glossary, model, added)
+            self.assertIndexed(glossary, model, added)
+            glossary.reindex()  # indexes entries again in glosslist order
+            self.assertIndexed(glossary, model, {id(entry): i for i, entry in enumerate(model)})
+
+
+class SortedTest(unittest.TestCase):
+    def assertSorted(self, glossary, names:set, label:str):
+        '''glossary has exactly the entries called names, in the order its collation puts them'''
+        collate = GlossCollate.get_collation(glossary.collation)
+        self.assertEqual(sorted(entry.name for entry in glossary.glosslist), sorted(names), label)
+        keys = [collate(entry.name) for entry in glossary.glosslist]
+        self.assertEqual(keys, sorted(keys), label)
+        for name in names:
+            self.assertEqual(glossary.get_entry(name).name, name, label)
+
+    def test_random_changes(self):
+        pool = NAMES + [f"term {i}" for i in range(3 * GreatGloss.BULK_INSERT)]
+        for seed in range(40):
+            rng = random.Random(seed)
+            glossary = GreatGloss.GreatGloss("Sorted", duplicates="last", collation=rng.choice(sorted(GlossCollate.COLLATIONS)))
+            names: set = set()
+            for step in range(60):
+                label = f"seed {seed}, step {step}, collation={glossary.collation}"
+                change = rng.choice(("add", "add", "bulk", "remove", "replace", "collation"))
+                if change == "add":
+                    name = rng.choice(pool)
+                    glossary.add_entry(GlossEntry(name, definition=str(step)))
+                    names.add(name)
+                elif change == "bulk":
+                    batch = rng.sample(pool, rng.randint(1, 2 * GreatGloss.BULK_INSERT))
+                    glossary.add_entries([GlossEntry(name, definition=str(step)) for name in batch])
+                    names.update(batch)
+                elif change == "remove" and names:
+                    name = rng.choice(sorted(names))
+                    glossary.remove_entry(name)
+                    names.remove(name)
+                elif change == "replace" and names:
+                    name = rng.choice(sorted(names))
+                    new = rng.choice([name] + [other for other in pool if other not in names])
+                    glossary.replace_entry(name, GlossEntry(new, definition=str(step)))
+                    names.remove(name)
+                    names.add(new)
+                elif change == "collation":
+                    glossary.sort_entries(collation=rng.choice(sorted(GlossCollate.COLLATIONS)))
+                self.assertSorted(glossary, names, label)
+
+
+if __name__ == "__main__":
+    unittest.main()
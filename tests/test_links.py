@@ -0,0 +1,88 @@
+'''Checks that links are turned into RST exactly as the original word-by-word parser did it, so
+glossaries built before and after the single-pass scanner are the same byte for byte.
+Run with python3 -m unittest discover tests (or pytest).'''
+import random
+import re
+import unittest
+import warnings
+from glossarpy import GlossLink
+from glossarpy.GlossEntry import GlossEntry
+
+TRICKY = [
+    "a [cat] and a [dog], or [Seven Bridges] and [Seven  Bridges Genomics].",
+    "[unterminated link at the end",
+    "an [unterminated link] followed by [another one",
+    "[a]b letters after a link, ]x malformed words, x]y and a]]",
+    "[[double]] brackets [[ and ]] on their own, [x]] and [[y]",
+    "[] empty [ ] links ] and [",
+    "[Seven Bridges] and [Seven Bridges]　with Unicode\u0085whitespace\u000b\u000c",
+    "(see [wolf]) [Juice], [é]] [ß]x [a,]x c]d] [e]f]",
+    "\t leading and trailing whitespace \n",
+    "",
+]
+PIECES = ["cat", "[cat]", "[Seven", "Bridges]", "[a]b", "x]y", "]", "[", "[]", "[x]]", "dog,", "[Juice],", "(see [wolf])",
+    "a]]", "[b", "c]d]", "[c]]x", "]]", "[[d]", "[e]f]", "é]", "[ß]", "a[b", "[a,]x", "[ y"]
+SPACES = [" ", "  ", "\n", "\t", " ", " ", "　", " ", "\u0085", " \t "]
+
+
+def original_rst_process_brackets(words:list):
+    '''rst_process_brackets() as it was before GlossLink, minus the warning it printed'''
+    words_processed = []
+    multi_word_flag = False
+    for word in words:
+        if re.search("][a-zA-Z]+", word):
+            pass
+        elif word.startswith("["):
+            word = word[1:]
+            if "]" in word:
+                multi_word_flag = False
+                word = word.replace("]", "`")
+                word = f":ref:`dict {word}"
+            else:
+                multi_word_flag = True
+                word = f":ref:`dict {word}"
+            words_processed.append(word)
+        elif multi_word_flag is True:
+            if "]" in word:
+                multi_word_flag = False
+                word = word.replace("]", "`")
+            words_processed.append(word)
+        else:
+            words_processed.append(word)
+    return " ".join(words_processed)
+
+
+def _random_text(rng:random.Random):
+    return "".join(rng.choice(PIECES) + rng.choice(SPACES + [""]) for _ in range(rng.randint(0, 10)))
+
+
+class OriginalParserTest(unittest.TestCase):
+    def setUp(self):
+        self.entry = GlossEntry("test")
+        rng = random.Random(0)
+        self.texts = TRICKY + [_random_text(rng) for _ in range(5000)]
+
+    def test_rst_links(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", GlossLink.GlossLinkWarning)
+            for text in self.texts:
+                self.assertEqual(GlossLink.rst_links(text), original_rst_process_brackets(text.split()), repr(text))
+
+    def test_rst_process_brackets(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", GlossLink.GlossLinkWarning)
+            for text in self.texts:
+                for words in (text.split(), text.split(" ")):
+                    self.assertEqual(self.entry.rst_process_brackets(words), original_rst_process_brackets(words), repr(words))
+
+    def test_generated_rst(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", GlossLink.GlossLinkWarning)
+            for text in self.texts:
+                if text.strip():
+                    rst = GlossEntry("test", definition=text).generate_RST()
+                    self.assertIn(f"    {original_rst_process_brackets(text.split())}  \n\n", rst, repr(text))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+'''Checks that the ways of rendering a glossary (serially, in parallel, from a cache or from what
+was kept) all give the same output. Run with python3 -m unittest discover tests (or pytest).'''
+import datetime
+import json
+import os
+import tempfile
+import unittest
+from glossarpy import GreatGloss
+from glossarpy.GlossEntry import GlossEntry
+
+ENTRIES = GreatGloss.PARALLEL_MIN_ENTRIES + 100
+
+
+def _glossary(**kwargs):
+    glossary = GreatGloss.GreatGloss("Rendered", **kwargs)
+    for i in range(ENTRIES):
+        glossary.add_entry(GlossEntry(f"term {i}", definition=f"links to [term {(i * 7) % ENTRIES}]",
+            updated=datetime.date(2022, 6, 1)))
+    return glossary
+
+
+class ParallelTest(unittest.TestCase):
+    def test_one_fragment_per_entry(self):
+        glossary = _glossary()
+        serial = list(glossary.iter_render(skipTOC=True))
+        for executor in ("thread", "process"):
+            parallel = list(glossary.iter_render(skipTOC=True, workers=2, executor=executor))
+            self.assertEqual(len(parallel), len(serial), executor)
+            self.assertEqual(parallel, serial, executor)
+
+
+class KeptTest(unittest.TestCase):
+    def test_cache_keeps_what_was_kept(self):
+        for workers in (1, 2):
+            glossary = _glossary(keep_rendered=True)
+            with tempfile.TemporaryDirectory() as directory:
+                output, cache = os.path.join(directory, "glossary.rst"), os.path.join(directory, "cache.json")
+                for _ in range(2):  # the second time, every entry is kept from the first
+                    glossary.write_glossary(output, append=False, cache=cache, workers=workers, executor="thread")
+                    with open(cache, encoding="utf-8") as f:
+                        self.assertEqual(len(json.load(f)["fragments"]), ENTRIES, f"workers={workers}")
+
+
+if __name__ == "__main__":
+    unittest.main()
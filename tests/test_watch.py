@@ -0,0 +1,162 @@
+'''Checks that watching a glossary gives the same outputs as building it from scratch.
+Run with python3 -m unittest discover tests (or pytest).'''
+import csv
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import unittest
+from glossarpy import GlossCLI
+from glossarpy import GlossLoad
+from glossarpy import GlossWatch
+
+NAMES = [f"term {i}" for i in range(12)]
+
+
+def _record(rng:random.Random):
+    name = rng.choice(NAMES)
+    words = [rng.choice(("a", "b", "c", f"[{rng.choice(NAMES)}]")) for _ in range(rng.randint(1, 4))]
+    return {"name": name, "definition": f"{name} is {' '.join(words)} {rng.randint(0, 9)}"}
+
+
+def _line(rng:random.Random):
+    return rng.choice(("", " ", json.dumps(_record(rng)), json.dumps(_record(rng)), json.dumps(_record(rng))))
+
+
+def _edit(rng:random.Random, lines:list):
+    '''Make one random change to lines, in place'''
+    i = rng.randint(0, len(lines))
+    change = rng.choice(("insert", "delete", "replace", "duplicate", "move"))
+    if change == "insert" or not lines:
+        lines.insert(i, _line(rng))
+        return
+    i = min(i, len(lines) - 1)
+    if change == "delete":
+        del lines[i]
+    elif change == "replace":
+        lines[i] = _line(rng)
+    elif change == "duplicate":
+        lines.insert(rng.randint(0, len(lines)), lines[i])
+    else:
+        lines.insert(rng.randint(0, len(lines) - 1), lines.pop(i))
+
+
+class WatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.time = 1_000_000_000_000_000_000
+        self.messages: list = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name:str):
+        return os.path.join(self.directory.name, name)
+
+    def save(self, name:str, text:str):
+        with open(self.path(name), "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        # so the watcher sees every change, however quickly they come
+        self.time += 1_000_000_000
+        os.utime(self.path(name), ns=(self.time, self.time))
+
+    def save_jsonl(self, name:str, lines:list, newline:bool = True):
+        self.save(name, "\n".join(lines) + ("\n" if newline and lines else ""))
+
+    def save_csv(self, name:str, lines:list):
+        text = io.StringIO()
+        writer = csv.writer(text, lineterminator="\n")
+        writer.writerow(["name", "definition"])
+        for line in lines:
+            if line.strip():
+                record = json.loads(line)
+                writer.writerow([record["name"], record["definition"]])
+        self.save(name, text.getvalue())
+
+    def watcher(self, sources:list, duplicates:str, collation:str, depends:tuple = ()):
+        with open(self.path("glossarpy.toml"), "w", encoding="utf-8") as f:
+            f.write(f'[[glossary]]\ntitle = "Watched"\nsources = {json.dumps(sources)}\noutput = "watched.rst"\n'
+                f'toc = "watched_toc.txt"\nduplicates = "{duplicates}"\ncollation = {collation}\n'
+                f'depends = {json.dumps(list(depends))}\n')
+        settings = GlossCLI.load_config(self.path("glossarpy.toml"))[0]
+        watcher = GlossWatch.GlossWatcher(settings, report=self.messages.append)
+        watcher.start()
+        return watcher
+
+    def assertSameAsBuild(self, watcher, label:str):
+        settings = dict(watcher.settings, output=self.path("built.rst"), toc=self.path("built_toc.txt"))
+        try:
+            GlossCLI.build(settings)
+        except GlossLoad.GlossLoadError:
+            return  # duplicates = "error", and there are some; the watcher only reports them
+        for watched, built in (("watched.rst", "built.rst"), ("watched_toc.txt", "built_toc.txt")):
+            with open(self.path(watched), encoding="utf-8") as f, open(self.path(built), encoding="utf-8") as g:
+                self.assertEqual(f.read(), g.read(), f"{watched} after {label}")
+
+    def test_blank_line_filled_in(self):
+        a, b, c = (json.dumps({"name": name, "definition": "x"}) for name in ("A", "B", "C"))
+        self.save_jsonl("entries.jsonl", [a, "", c])
+        watcher = self.watcher(["entries.jsonl"], "first", '"upper"')
+        for lines in ([a, b, c], [a, b]):
+            self.save_jsonl("entries.jsonl", lines)
+            watcher.poll()
+            self.assertSameAsBuild(watcher, repr(lines))
+        self.assertEqual(sorted(watcher.sources[0].found), ["A", "B"])
+
+    def test_duplicates_across_sources(self):
+        first = [json.dumps({"name": "A", "definition": "from the first"})]
+        second = [json.dumps({"name": "A", "definition": "from the second"})]
+        self.save_jsonl("first.jsonl", first)
+        self.save_jsonl("second.jsonl", second)
+        for duplicates in ("first", "last"):
+            watcher = self.watcher(["first.jsonl", "second.jsonl"], duplicates, '"upper"')
+            for definition in ("edited", "edited again"):
+                self.save_jsonl("first.jsonl", [json.dumps({"name": "A", "definition": definition})])
+                watcher.poll()
+                self.assertSameAsBuild(watcher, f"{duplicates}: editing the first source")
+
+    def test_depends(self):
+        self.save("helper_for_watch_test.py", 'DEFINITION = "before"\n')
+        self.save("entries.py", "import os\nimport sys\nsys.path.insert(0, os.path.dirname(__file__))\n"
+            "import helper_for_watch_test\nfrom glossarpy.GlossEntry import GlossEntry\n"
+            "helped = GlossEntry(\"helped\", definition=helper_for_watch_test.DEFINITION)\n")
+        path = list(sys.path)
+        try:
+            watcher = self.watcher(["entries.py"], "error", '"upper"', depends=["helper_for_watch_test.py"])
+            self.save("helper_for_watch_test.py", 'DEFINITION = "after"\n')
+            self.assertEqual(watcher.poll(), 1)
+            self.assertEqual(watcher.glossary.get_entry("helped").definition, "after")
+            self.assertSameAsBuild(watcher, "editing a module a Python source imports")
+        finally:
+            sys.path[:] = path
+            sys.modules.pop("helper_for_watch_test", None)
+
+    def test_random_edits(self):
+        for seed in range(40):
+            rng = random.Random(seed)
+            duplicates = rng.choice(("first", "last", "error"))
+            collation = rng.choice(('"upper"', "false"))
+            sources = {"one.jsonl": [], "two.jsonl": [], "three.csv": []}
+            for name, lines in sources.items():
+                lines.extend(_line(rng) for _ in range(rng.randint(0, 6)))
+                if name.endswith(".csv"):
+                    self.save_csv(name, lines)
+                else:
+                    self.save_jsonl(name, lines)
+            watcher = self.watcher(list(sources), duplicates, collation)
+            self.assertSameAsBuild(watcher, f"seed {seed}: start")
+            for step in range(30):
+                name = rng.choice(list(sources))
+                _edit(rng, sources[name])
+                if name.endswith(".csv"):
+                    self.save_csv(name, sources[name])
+                else:
+                    self.save_jsonl(name, sources[name], newline=rng.random() < 0.8)
+                watcher.poll()
+                self.assertSameAsBuild(watcher, f"seed {seed}, step {step}: {duplicates}, collation {collation}")
+
+
+if __name__ == "__main__":
+    unittest.main()